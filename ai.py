@@ -0,0 +1,380 @@
+"""
+ai.py
+This file holds the AI recommendation system of the Tetris game. It finds
+every position where the current block can come to rest with the moves of
+the game (left, right, rotate and down, so also slides and rotations under
+an overhang) with a flood fill over the (rotation, row, column) states,
+starting below the rows where the block can move freely. For each of them
+it puts the block down, cleans the lines and scores the resulting board as
+a weighted sum of features: the number of cleared lines, holes, stack
+height, bumpiness, wells and row and column transitions. The weights are
+read at startup from ai_weights.json (written by tune.py) and fall back to
+the original hand-picked weights. When the next block is known the search
+can look ahead: the best boards after the current block are kept
+(beam search) and each of them is tried with every placement of the next
+block, so the hint picks the placement that sets up the best pair of moves.
+Players often ask for a hint several times on the same board, so results
+are kept in a bounded LRU transposition cache keyed on the board rows and
+the block: a repeated hint is a dictionary lookup, and the lookahead reuses
+the scored placements of every (board, block) it has already expanded.
+It only depends on the game rules in engine.py, so it can be used by the
+game window and by headless tools alike.
+
+Authors: Yifan Qin, Kevin Abeykoon, Joanna Joy, Vivian Ma
+"""
+
+import json
+import os
+from collections import OrderedDict
+
+from board import BLOCK_COL_NUM, BLOCK_ROW_NUM, FULL_ROW, can_place, drop_row
+from engine import (START_COL, START_ROW, add_to_stop_all_block_list, change_current_block_style, judge_game_over,
+                    judge_lines)
+from pieces import SHAPES, rotation_count
+
+# how many blocks the search plays (current block, next block, ...)
+SEARCH_DEPTH = 2
+# how many boards are kept after each block of the lookahead
+BEAM_WIDTH = 8
+# how many entries the transposition cache keeps
+CACHE_SIZE = 4096
+
+WEIGHTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ai_weights.json')
+
+# lines is the number of lines cleared by the move, the others describe the
+# board after the move
+FEATURES = ('lines', 'holes', 'height', 'bumpiness', 'wells', 'row_transitions', 'col_transitions')
+
+# the original scoring: cleared_lines * 20 - holes * 10 - height * 2 with 10 points per line
+DEFAULT_WEIGHTS = {'lines': 200, 'holes': -10, 'height': -2}
+
+# rows of the tallest block drawing
+GRID_ROWS = max(len(shape.grid) for shape in SHAPES)
+
+# placement search: a board row shifted by two columns between walls two cells
+# thick (a move or a rotation next to a wall sticks out by at most two), the
+# floor, and the row masks of every shape with the shift of its first column
+SEARCH_WALLS = 0b11 | 0b11 << (BLOCK_COL_NUM + 2)
+SEARCH_FLOOR = (1 << (BLOCK_COL_NUM + 4)) - 1
+SEARCH_MASKS = [(shape.min_col + 2, shape.row_masks) for shape in SHAPES]
+
+# a row with a wall cell on both sides, for counting row transitions
+WALLS = 1 | (1 << (BLOCK_COL_NUM + 1))
+WALLED_ROW = (1 << (BLOCK_COL_NUM + 1)) - 1
+
+
+def load_weights(path=WEIGHTS_FILE):
+    """
+    feature weights written by tune.py, the default weights when there is no file
+    """
+    try:
+        with open(path) as file:
+            weights = json.load(file)['weights']
+    except FileNotFoundError:
+        return dict(DEFAULT_WEIGHTS)
+
+    unknown = set(weights) - set(FEATURES)
+    if unknown:
+        raise ValueError('unknown features in %s: %s' % (path, ', '.join(sorted(unknown))))
+    return weights
+
+
+WEIGHTS = load_weights()
+
+
+class TranspositionCache:
+    """
+    bounded LRU cache with hit / miss / eviction counters
+    """
+
+    def __init__(self, max_size=CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        cached value (None when missing), marks the entry as recently used
+        """
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+# shared by the hint key, the mouse/gesture hint and the lookahead search
+HINT_CACHE = TranspositionCache()
+
+
+def count_holes(board):
+    """
+    number of empty cells that have a block somewhere above them
+    """
+    return board.hole_count()
+
+
+def get_stack_height(board):
+    """
+    height of the highest block (0 for an empty board)
+    """
+    return board.stack_height()
+
+
+def get_column_heights(board):
+    return board.heights
+
+
+def get_bumpiness(heights):
+    """
+    sum of the height differences of neighbouring columns
+    """
+    return sum(abs(left - right) for left, right in zip(heights, heights[1:]))
+
+
+def get_wells(heights):
+    """
+    sum of the depths of the columns lower than both neighbours (walls count as high)
+    """
+    walled = [BLOCK_ROW_NUM] + heights + [BLOCK_ROW_NUM]
+    wells = 0
+    for col in range(1, BLOCK_COL_NUM + 1):
+        depth = min(walled[col - 1], walled[col + 1]) - walled[col]
+        if depth > 0:
+            wells += depth
+    return wells
+
+
+def get_row_transitions(board):
+    """
+    number of filled/empty changes along every row, the walls count as filled
+    """
+    transitions = 0
+    for mask in board.rows:
+        walled = (mask << 1) | WALLS
+        transitions += ((walled ^ (walled >> 1)) & WALLED_ROW).bit_count()
+    return transitions
+
+
+def get_col_transitions(board):
+    """
+    number of filled/empty changes down every column, the floor counts as filled
+    """
+    rows = board.rows
+    transitions = sum((upper ^ lower).bit_count() for upper, lower in zip(rows, rows[1:]))
+    return transitions + (~rows[-1] & FULL_ROW).bit_count()
+
+
+def board_features(board, names=FEATURES):
+    """
+    the requested board features (every feature but lines) as a dict
+    """
+    features = {}
+    heights = None
+    for name in names:
+        if name == 'holes':
+            features[name] = count_holes(board)
+        elif name == 'height':
+            features[name] = get_stack_height(board)
+        elif name in ('bumpiness', 'wells'):
+            heights = heights or get_column_heights(board)
+            features[name] = get_bumpiness(heights) if name == 'bumpiness' else get_wells(heights)
+        elif name == 'row_transitions':
+            features[name] = get_row_transitions(board)
+        elif name == 'col_transitions':
+            features[name] = get_col_transitions(board)
+    return features
+
+
+def evaluate_board(board, weights=None):
+    """
+    score of a board without the points of the cleared lines
+    """
+    if judge_game_over(board):
+        return float('-inf')
+    weights = WEIGHTS if weights is None else weights
+    features = board_features(board, [name for name, weight in weights.items() if weight])
+    return sum(weights[name] * value for name, value in features.items())
+
+
+def get_placements(current_block, board, cache=HINT_CACHE):
+    """
+    every resting position the block can reach from the top of the board with
+    the moves of the game (left, right, rotate, down), slides and rotations
+    under overhangs included: (turns, block, column, landing row); cached per
+    board and block
+    """
+    key = ('placements', tuple(board.rows), current_block.id)
+    placements = cache.get(key) if cache is not None else None
+    if placements is not None:
+        return placements
+
+    shapes = [current_block]
+    while len(shapes) < rotation_count(current_block):
+        shapes.append(change_current_block_style(shapes[-1]))
+    turns_of = {shape.id: turns for turns, shape in enumerate(shapes)}
+
+    # the board rows with two wall columns on each side, the rows above the
+    # board and a floor, so a position only has to be tested against the rows
+    padded = [SEARCH_WALLS] * -START_ROW + [mask << 2 | SEARCH_WALLS for mask in board.rows] + [SEARCH_FLOOR] * GRID_ROWS
+
+    def fits(shape_id, row, col):
+        shift, row_masks = SEARCH_MASKS[shape_id]
+        shift += col
+        row -= START_ROW
+        for offset, mask in row_masks:
+            if padded[row + offset] & mask << shift:
+                return False
+        return True
+
+    # down to open_row every rotation is above the highest block in every
+    # column, the block can go anywhere there: only the rows below are searched
+    open_row = BLOCK_ROW_NUM - board.stack_height() - GRID_ROWS
+    resting = []
+    if open_row >= START_ROW:
+        frontier = []
+        for shape in shapes:
+            for col in range(-shape.min_col, BLOCK_COL_NUM - shape.max_col):
+                if fits(shape.id, open_row + 1, col):
+                    frontier.append((shape.id, open_row + 1, col))
+                else:
+                    resting.append((shape.id, open_row, col))
+    elif can_place(current_block, START_ROW, START_COL, board):
+        # the stack reaches the top, search from where the block appears
+        frontier = [(current_block.id, START_ROW, START_COL)]
+    else:
+        frontier = []
+
+    seen = set(frontier)
+    while frontier:
+        state = frontier.pop()
+        shape_id, row, col = state
+        below = (shape_id, row + 1, col)
+        if fits(*below):
+            if below not in seen:
+                seen.add(below)
+                frontier.append(below)
+        else:
+            resting.append(state)
+        for move in ((shape_id, row, col - 1), (shape_id, row, col + 1), (SHAPES[shape_id].next_id, row, col)):
+            if move not in seen and fits(*move):
+                seen.add(move)
+                frontier.append(move)
+
+    placements = [(turns_of[shape_id], SHAPES[shape_id], col, row) for shape_id, row, col in resting]
+    placements.sort(key=lambda placement: (placement[0], placement[2], placement[3]))
+    if cache is not None:
+        cache.put(key, placements)
+    return placements
+
+
+def play_placement(board, current_block, col, row):
+    """
+    board after the placement and the points of the cleared lines
+    """
+    temp_board = board.copy()
+    add_to_stop_all_block_list(temp_board, current_block, row, col)
+    return temp_board, judge_lines(temp_board)
+
+
+def expand_placements(current_block, board, weights=None, cache=HINT_CACHE):
+    """
+    every placement of the block with its score and line points:
+    (score, points, placement), best first; cached per board, block and weights
+    """
+    weights = WEIGHTS if weights is None else weights
+    key = ('expand', tuple(board.rows), current_block.id, tuple(sorted(weights.items())))
+    scored = cache.get(key) if cache is not None else None
+    if scored is not None:
+        return scored
+
+    scored = []
+    for placement in get_placements(current_block, board, cache):
+        turns, block, col, row = placement
+        next_board, cleared_lines = play_placement(board, block, col, row)
+        points = cleared_lines // 10 * weights.get('lines', 0)
+        scored.append((points + evaluate_board(next_board, weights), points, placement))
+    scored.sort(key=lambda item: item[0], reverse=True)
+
+    if cache is not None:
+        cache.put(key, scored)
+    return scored
+
+
+def search_best_position(blocks, board, depth=SEARCH_DEPTH, beam_width=BEAM_WIDTH, weights=None, cache=HINT_CACHE):
+    """
+    beam search over the known blocks (current block first), returns the
+    score and the placement of the first block on the best path
+    """
+    depth = max(1, min(depth, len(blocks)))
+    weights = WEIGHTS if weights is None else weights
+    key = ('best', tuple(board.rows), tuple(block.id for block in blocks[:depth]), depth, beam_width,
+           tuple(sorted(weights.items())))
+    result = cache.get(key) if cache is not None else None
+    if result is not None:
+        return result
+
+    # (points so far, board, first placement)
+    beam = [(0, board, None)]
+    best = None
+    for level in range(depth):
+        scored = []
+        for points, temp_board, first in beam:
+            for score, cleared_points, placement in expand_placements(blocks[level], temp_board, weights, cache):
+                scored.append((points + score, points + cleared_points, temp_board, placement, first or placement))
+
+        # no room for this block on any kept board: keep the shallower result
+        if not scored:
+            break
+        scored.sort(key=lambda item: item[0], reverse=True)
+        best = scored[0]
+        beam = []
+        for _, total, temp_board, placement, first in scored[:beam_width]:
+            turns, current_block, col, row = placement
+            beam.append((total, play_placement(temp_board, current_block, col, row)[0], first))
+
+    result = (float('-inf'), None) if best is None else (best[0], best[4])
+    if cache is not None:
+        cache.put(key, result)
+    return result
+
+
+def ai_suggest_best_position(current_block, board, next_block=None, depth=SEARCH_DEPTH, beam_width=BEAM_WIDTH,
+                             weights=None):
+    """
+    best placement of the current block (looking ahead at the next block when
+    it is given), returns the board columns, the number of turns, the block
+    and whether it has to slide under an overhang (a straight drop in its
+    columns lands higher)
+    """
+    blocks = [current_block] if next_block is None else [current_block, next_block]
+    best_score, best = search_best_position(blocks, board, depth, beam_width, weights)
+    if best is None:
+        return [], 0, current_block, False
+
+    best_rotation, best_block, best_col, best_row = best
+    best_col_list = [best_col + col for col in range(best_block.min_col, best_block.max_col + 1)]
+    slide = best_row != drop_row(best_block, START_ROW, best_col, board)
+
+    return best_col_list, best_rotation, best_block, slide
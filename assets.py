@@ -0,0 +1,72 @@
+"""
+assets.py
+This file loads the files the game window needs (font, logo and music) from
+the folder of the game, so the game runs from wherever it is installed. An
+image is loaded, converted and scaled only once, a font is opened once per
+size, and rendered texts are kept in a cache: every text has a key (e.g.
+'score') and is only rendered again when its value changes, so labels that
+never change are rendered exactly once.
+
+Authors: Yifan Qin, Kevin Abeykoon, Joanna Joy, Vivian Ma
+"""
+
+import os
+
+import pygame
+
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+
+FONT_FILE = 'PokemonGb-RAeo.ttf'
+LOGO_FILE = 'Tetr.ai_Logo.png'
+MUSIC_FILE = 'tetris music.mp3'
+
+
+def asset_path(name):
+    """
+    path of a file shipped with the game
+    """
+    return os.path.join(ASSET_DIR, name)
+
+
+class Assets:
+    """
+    images, fonts and rendered texts, each made once and then reused
+    (pygame.display.set_mode must have been called before using images)
+    """
+
+    def __init__(self, font_file=FONT_FILE):
+        self.font_file = font_file
+        self.fonts = {}
+        self.images = {}
+        self.texts = {}  # key: (text, size, color, surface)
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pygame.font.Font(asset_path(self.font_file), size)
+        return font
+
+    def image(self, name, size=None):
+        """
+        converted image, smoothly scaled to size (width, height) when given
+        """
+        key = (name, size)
+        image = self.images.get(key)
+        if image is None:
+            if size is None:
+                image = pygame.image.load(asset_path(name)).convert()
+            else:
+                image = pygame.transform.smoothscale(self.image(name), size)
+            self.images[key] = image
+        return image
+
+    def text(self, key, text, size, color):
+        """
+        rendered text for key, rendered again only when the text, size or color changed
+        """
+        cached = self.texts.get(key)
+        if cached is not None and cached[:3] == (text, size, color):
+            return cached[3]
+        surface = self.font(size).render(text, True, color)
+        self.texts[key] = (text, size, color, surface)
+        return surface
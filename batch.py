@@ -0,0 +1,310 @@
+"""
+batch.py
+This file runs many Tetris games at once with NumPy. The boards use the same
+layout as board.Board (one bitmask per row) and are kept in a single uint16
+array of shape (games, BLOCK_ROW_NUM). Every call to step() plays one
+placement (rotation and column, dropped straight down like Engine.play) on
+every board in lockstep. Landing rows, placement, line clearing, hole
+counting and column heights are array operations over the whole batch, so
+evaluating heuristic weights or producing training data for the hint system
+does not need a Python loop per board.
+
+The rules match engine.py: each cleared line is worth 10 points, cells that
+end up above the top of the board are lost and a game is over as soon as the
+top row holds a block or the chosen placement no longer fits.
+
+Authors: Yifan Qin, Kevin Abeykoon, Joanna Joy, Vivian Ma
+
+Notes:
+pip install numpy
+"""
+
+import numpy as np
+
+from ai import WALLED_ROW, WALLS, WEIGHTS
+from board import BLOCK_COL_NUM, BLOCK_ROW_NUM, FULL_ROW
+from engine import START_ROW
+from pieces import BLOCK_STYLE_LIST, PIECE_FIRST_IDS, SHAPES
+
+# shape table as arrays, every block has 4 cells and at most 4 occupied rows
+# (missing rows are padded with an empty mask)
+CELL_ROWS = np.array([[row for row, _ in shape.cells] for shape in SHAPES])
+CELL_COLS = np.array([[col for _, col in shape.cells] for shape in SHAPES])
+MASK_ROWS = np.array([[row for row, _ in shape.row_masks] + [0] * (4 - len(shape.row_masks)) for shape in SHAPES])
+MASKS = np.array([[mask for _, mask in shape.row_masks] + [0] * (4 - len(shape.row_masks)) for shape in SHAPES],
+                 dtype=np.uint16)
+MIN_COL = np.array([shape.min_col for shape in SHAPES])
+MAX_COL = np.array([shape.max_col for shape in SHAPES])
+SHAPE_PIECE = np.array([shape.piece for shape in SHAPES])
+FIRST_IDS = np.array(PIECE_FIRST_IDS)
+ROTATIONS = np.array([len(block_list) for block_list in BLOCK_STYLE_LIST])
+
+# candidate placements for one block: every rotation slot times every column
+# a block may start in (the left-most drawing column can be off the board)
+MAX_ROTATIONS = int(ROTATIONS.max())
+CANDIDATE_COLS = np.arange(-int(MIN_COL.max()), BLOCK_COL_NUM)
+CANDIDATE_NUM = MAX_ROTATIONS * len(CANDIDATE_COLS)
+
+# number of set bits of every row value (rows with the two wall cells included)
+POPCOUNT = np.array([bin(mask).count('1') for mask in range(WALLED_ROW + 1)])
+
+
+def rows_from_boards(boards):
+    """
+    stack board.Board objects into one (games, BLOCK_ROW_NUM) array
+    """
+    return np.array([board.rows for board in boards], dtype=np.uint16)
+
+
+def covered_rows(rows):
+    """
+    for every row, the columns that have a block on this row or above it
+    """
+    return np.bitwise_or.accumulate(rows, axis=-1)
+
+
+def column_heights(rows, covered=None):
+    """
+    height of every column: the number of rows from its highest block down
+    """
+    covered = covered_rows(rows) if covered is None else covered
+    heights = np.empty(rows.shape[:-1] + (BLOCK_COL_NUM,), dtype=np.int64)
+    for col in range(BLOCK_COL_NUM):
+        heights[..., col] = ((covered >> col) & 1).sum(axis=-1)
+    return heights
+
+
+def column_tops(rows):
+    """
+    row of the highest block in every column (BLOCK_ROW_NUM when empty)
+    """
+    return BLOCK_ROW_NUM - column_heights(rows)
+
+
+def stack_heights(rows, covered=None):
+    covered = covered_rows(rows) if covered is None else covered
+    return (covered != 0).sum(axis=-1)
+
+
+def count_holes(rows, covered=None):
+    """
+    number of empty cells below the highest block of their column, per board
+    """
+    covered = covered_rows(rows) if covered is None else covered
+    return POPCOUNT[covered & ~rows & FULL_ROW].sum(axis=-1)
+
+
+def bumpiness(heights):
+    return np.abs(np.diff(heights, axis=-1)).sum(axis=-1)
+
+
+def wells(heights):
+    """
+    sum of the depths of the columns lower than both neighbours (walls count as high)
+    """
+    wall = np.full(heights.shape[:-1] + (1,), BLOCK_ROW_NUM)
+    walled = np.concatenate([wall, heights, wall], axis=-1)
+    depth = np.minimum(walled[..., :-2], walled[..., 2:]) - heights
+    return np.maximum(depth, 0).sum(axis=-1)
+
+
+def row_transitions(rows):
+    walled = (rows.astype(np.int64) << 1) | WALLS
+    return POPCOUNT[(walled ^ (walled >> 1)) & WALLED_ROW].sum(axis=-1)
+
+
+def col_transitions(rows):
+    inner = POPCOUNT[rows[..., :-1] ^ rows[..., 1:]].sum(axis=-1)
+    return inner + POPCOUNT[~rows[..., -1] & FULL_ROW]
+
+
+def board_features(rows, lines, names):
+    """
+    the requested features of every board after a move that cleared lines
+    """
+    covered = covered_rows(rows)
+    features = {}
+    heights = None
+    for name in names:
+        if name == 'lines':
+            features[name] = lines
+        elif name == 'holes':
+            features[name] = count_holes(rows, covered)
+        elif name == 'height':
+            features[name] = stack_heights(rows, covered)
+        elif name in ('bumpiness', 'wells'):
+            heights = column_heights(rows, covered) if heights is None else heights
+            features[name] = bumpiness(heights) if name == 'bumpiness' else wells(heights)
+        elif name == 'row_transitions':
+            features[name] = row_transitions(rows)
+        elif name == 'col_transitions':
+            features[name] = col_transitions(rows)
+        else:
+            raise ValueError('unknown feature: %r' % (name,))
+    return features
+
+
+def landing_rows(tops, shape_ids, cols):
+    """
+    row every block lands on when dropped from the top of boards with the
+    given column tops, and whether the placement is allowed (inside the
+    walls and still fits at the top)
+    """
+    inside = (cols + MIN_COL[shape_ids] >= 0) & (cols + MAX_COL[shape_ids] < BLOCK_COL_NUM)
+    board_cols = np.clip(cols[:, None] + CELL_COLS[shape_ids], 0, BLOCK_COL_NUM - 1)
+    cell_tops = np.take_along_axis(tops, board_cols, axis=1)
+    landing = (cell_tops - CELL_ROWS[shape_ids] - 1).min(axis=1)
+    return landing, inside & (landing >= START_ROW)
+
+
+def place(rows, shape_ids, cols, landing, mask):
+    """
+    put the blocks on the boards selected by mask (in place)
+    """
+    board_rows = landing[:, None] + MASK_ROWS[shape_ids]
+    shift = np.clip(cols + MIN_COL[shape_ids], 0, BLOCK_COL_NUM - 1)
+    masks = MASKS[shape_ids] << shift[:, None].astype(np.uint16)
+    keep = mask[:, None] & (board_rows >= 0) & (masks != 0)
+    index = np.broadcast_to(np.arange(len(rows))[:, None], board_rows.shape)
+    rows[index[keep], board_rows[keep]] |= masks[keep]
+
+
+def clear_lines(rows):
+    """
+    remove the full rows of every board (in place), return the lines per board
+    """
+    full = rows == FULL_ROW
+    lines = full.sum(axis=1)
+    cleared = np.flatnonzero(lines)
+    if len(cleared):
+        # stable sort moves the full rows to the top and keeps the others in order
+        order = np.argsort(~full[cleared], axis=1, kind='stable')
+        moved = np.take_along_axis(rows[cleared], order, axis=1)
+        moved[np.arange(BLOCK_ROW_NUM)[None, :] < lines[cleared, None]] = 0
+        rows[cleared] = moved
+    return lines
+
+
+def candidate_placements(current):
+    """
+    (shape id, column, valid) for every candidate placement of the current
+    blocks, each of shape (games, CANDIDATE_NUM)
+    """
+    pieces = SHAPE_PIECE[current]
+    slots = np.repeat(np.arange(MAX_ROTATIONS), len(CANDIDATE_COLS))
+    shape_ids = FIRST_IDS[pieces][:, None] + slots[None, :] % ROTATIONS[pieces][:, None]
+    cols = np.broadcast_to(np.tile(CANDIDATE_COLS, MAX_ROTATIONS), shape_ids.shape)
+    valid = slots[None, :] < ROTATIONS[pieces][:, None]
+    return shape_ids, cols, valid
+
+
+def evaluate_placements(rows, current, weights=None):
+    """
+    score every candidate placement of the current block on every board,
+    returns (scores, shape ids, columns); impossible placements score -inf
+    """
+    weights = WEIGHTS if weights is None else weights
+    shape_ids, cols, valid = candidate_placements(current)
+    games = len(rows)
+
+    trial = np.repeat(rows, CANDIDATE_NUM, axis=0)
+    tops = np.repeat(column_tops(rows), CANDIDATE_NUM, axis=0)
+    flat_shapes = shape_ids.ravel()
+    flat_cols = cols.ravel()
+    landing, fits = landing_rows(tops, flat_shapes, flat_cols)
+    fits &= valid.ravel()
+    place(trial, flat_shapes, flat_cols, landing, fits)
+    lines = clear_lines(trial)
+    features = board_features(trial, lines, [name for name, weight in weights.items() if weight])
+
+    scores = np.zeros(len(trial))
+    for name, value in features.items():
+        scores += weights[name] * value
+    # like ai.evaluate_board, a move that fills the top row is never chosen
+    scores[~fits | (trial[:, 0] != 0)] = -np.inf
+    return scores.reshape(games, CANDIDATE_NUM), shape_ids, cols
+
+
+class BatchEngine:
+    """
+    many games advanced in lockstep, one placement per game and step
+    """
+
+    def __init__(self, games, seed=None):
+        self.games = games
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        """
+        start new games on every board
+        """
+        self.rng = np.random.default_rng(seed)
+        self.rows = np.zeros((self.games, BLOCK_ROW_NUM), dtype=np.uint16)
+        self.score = np.zeros(self.games, dtype=np.int64)
+        self.lines = np.zeros(self.games, dtype=np.int64)
+        self.pieces = np.zeros(self.games, dtype=np.int64)
+        self.game_over = np.zeros(self.games, dtype=bool)
+        self.current = self.get_blocks()
+        self.next = self.get_blocks()
+
+    def get_blocks(self):
+        """
+        one new block per game (random piece, then random rotation like get_block)
+        """
+        pieces = self.rng.integers(0, len(ROTATIONS), self.games)
+        rotations = (self.rng.random(self.games) * ROTATIONS[pieces]).astype(np.int64)
+        return FIRST_IDS[pieces] + rotations
+
+    def heights(self):
+        return column_heights(self.rows)
+
+    def holes(self):
+        return count_holes(self.rows)
+
+    def step(self, shape_ids, cols):
+        """
+        drop the given rotation of every current block in the given column,
+        returns the lines cleared on each board
+        """
+        shape_ids = np.asarray(shape_ids)
+        cols = np.asarray(cols)
+        landing, fits = landing_rows(column_tops(self.rows), shape_ids, cols)
+        played = ~self.game_over & fits & (SHAPE_PIECE[shape_ids] == SHAPE_PIECE[self.current])
+
+        place(self.rows, shape_ids, cols, landing, played)
+        lines = np.where(played, clear_lines(self.rows), 0)
+        self.score += lines * 10
+        self.lines += lines
+        self.pieces += played
+
+        # a game whose block no longer fits is over, like a full top row
+        self.game_over |= ~played | (self.rows[:, 0] != 0)
+        new_blocks = self.get_blocks()
+        self.current = np.where(played, self.next, self.current)
+        self.next = np.where(played, new_blocks, self.next)
+        return lines
+
+    def greedy_step(self, weights=None):
+        """
+        play the best scoring placement on every board
+        """
+        alive = np.flatnonzero(~self.game_over)
+        scores, shape_ids, cols = evaluate_placements(self.rows[alive], self.current[alive], weights)
+        best = scores.argmax(axis=1)[:, None]
+
+        # finished games keep their block and are skipped by step()
+        chosen_shapes = self.current.copy()
+        chosen_cols = np.zeros(self.games, dtype=np.int64)
+        chosen_shapes[alive] = np.take_along_axis(shape_ids, best, axis=1)[:, 0]
+        chosen_cols[alive] = np.take_along_axis(cols, best, axis=1)[:, 0]
+        return self.step(chosen_shapes, chosen_cols)
+
+    def run(self, weights=None, max_pieces=None):
+        """
+        play every game greedily until all are over (or reach max_pieces)
+        """
+        while not self.game_over.all():
+            if max_pieces is not None and self.pieces.max() >= max_pieces:
+                break
+            self.greedy_step(weights)
+        return self.score
@@ -0,0 +1,410 @@
+"""
+bench.py
+This program measures the speed of the game rules and of the AI so that a
+change that makes them slower is noticed before it is committed. The
+primitives (can_place and drop_row, which replaced judge_move_down,
+judge_lines, count_holes, the board features and the placement generator)
+are timed on a fixed corpus of boards: an empty board, a mid-game board, a
+board close to the top and a fragmented board full of holes. On top of
+them it times full hint searches (with an empty and with a warm cache),
+whole headless games (the AI playing every block, and random key presses)
+and the cost of drawing one frame of the game window.
+
+Every benchmark is run a few times and the best time is kept, as the
+fastest run is the one least disturbed by the rest of the machine. A
+fixed piece of plain Python is timed as well, and the comparison is
+corrected by how much slower or faster it ran than for the baseline. The
+results are written to a JSON file. When a baseline file (saved earlier
+with --save-baseline) exists the results are compared with it and the
+program exits with status 1 when a benchmark got slower than the allowed
+tolerance, so it can be used as a local check before committing.
+
+Authors: Yifan Qin, Kevin Abeykoon, Joanna Joy, Vivian Ma
+
+Notes:
+>>> python3 bench.py --save-baseline (on the code before the change)
+>>> python3 bench.py (on the changed code, fails when something got more than 25% slower)
+>>> python3 bench.py --filter hint --tolerance 0.1 --json hint_results.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+from ai import HINT_CACHE, ai_suggest_best_position, board_features, count_holes, evaluate_board, \
+    get_placements, search_best_position
+from board import BLOCK_COL_NUM, BLOCK_ROW_NUM, FULL_ROW, Board, can_place, drop_row
+from engine import ACTIONS, START_ROW, Engine, judge_lines
+from pieces import PIECE_FIRST_IDS, SHAPES
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(BENCH_DIR, 'bench_results.json')
+BASELINE_FILE = os.path.join(BENCH_DIR, 'bench_baseline.json')
+
+# a benchmark fails when it is this much slower than the baseline
+TOLERANCE = 0.25
+# runs of every benchmark (the best one is kept) and the shortest run in seconds
+REPEAT = 5
+MIN_TIME = 0.05
+
+# seed of the corpus and of the games, so every run measures the same work
+SEED = 2024
+GAME_PIECES = 100
+
+# the times are compared relative to this benchmark, so a machine that is
+# busier or slower than when the baseline was saved does not fail every benchmark
+CALIBRATION = 'calibration'
+
+
+def board_from_rows(rows, letter='A'):
+    """
+    board with the given row masks, every cell in the same colour
+    """
+    colors = bytearray(b'.' * (BLOCK_ROW_NUM * BLOCK_COL_NUM))
+    for row, mask in enumerate(rows):
+        for col in range(BLOCK_COL_NUM):
+            if mask >> col & 1:
+                colors[row * BLOCK_COL_NUM + col] = ord(letter)
+    return Board(list(rows), colors)
+
+
+def random_placement(game, rng):
+    """
+    play the current block at a random resting position it can reach (slides
+    under an overhang included), or hard drop it when there is none
+    """
+    placements = get_placements(game.current_block, game.board, cache=None)
+    if not placements:
+        game.step('drop')
+        return
+    _, shape, col, row = rng.choice(placements)
+    game.play(shape, col, row)
+
+
+def make_corpus(seed=SEED):
+    """
+    the boards the primitives are timed on, by name
+    """
+    rng = random.Random(seed)
+
+    # the AI playing 40 blocks leaves a typical flat mid-game stack
+    game = Engine(seed)
+    for _ in range(40):
+        _, best = search_best_position([game.current_block, game.next_block], game.board, depth=1,
+                                       cache=None)
+        game.play(best[1], best[2], best[3])
+    mid_game = game.board
+
+    # random placements until the stack is close to the top
+    game = Engine(seed)
+    near_top = game.board
+    while not game.game_over and game.board.stack_height() < BLOCK_ROW_NUM - 5:
+        near_top = game.board.copy()
+        random_placement(game, rng)
+
+    # half filled rows with holes everywhere under a ragged surface
+    rows = [0] * BLOCK_ROW_NUM
+    for row in range(BLOCK_ROW_NUM // 2, BLOCK_ROW_NUM):
+        mask = FULL_ROW
+        while mask == FULL_ROW:
+            mask = rng.getrandbits(BLOCK_COL_NUM)
+        rows[row] = mask
+    fragmented = board_from_rows(rows)
+
+    return {'empty': Board(), 'mid_game': mid_game, 'near_top': near_top, 'fragmented': fragmented}
+
+
+def measure(function, repeat=REPEAT, min_time=MIN_TIME):
+    """
+    best seconds of one call of function(), calls are grouped so that one
+    run takes at least min_time (the garbage collector is off meanwhile, like timeit)
+    """
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return best_time(function, repeat, min_time)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def best_time(function, repeat, min_time):
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed * 4 >= min_time else 10
+
+    best = elapsed
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        best = min(best, time.perf_counter() - started)
+    return best / number
+
+
+def primitive_benchmarks(name, board):
+    """
+    (benchmark name, function, calls per function run) of the primitives on one board
+    """
+    # every rotation in every column, at the top and where it lands
+    positions = []
+    for shape in SHAPES:
+        for col in range(-shape.min_col, BLOCK_COL_NUM - shape.max_col):
+            if can_place(shape, START_ROW, col, board):
+                positions.append((shape, START_ROW, col))
+                positions.append((shape, drop_row(shape, START_ROW, col, board), col))
+    drops = [(shape, START_ROW, col) for shape, row, col in positions if row == START_ROW]
+    shapes = [SHAPES[first] for first in PIECE_FIRST_IDS]
+
+    def run_can_place():
+        for shape, row, col in positions:
+            can_place(shape, row, col, board)
+
+    def run_drop_row():
+        for shape, row, col in drops:
+            drop_row(shape, row, col, board)
+
+    def run_placements():
+        for shape in shapes:
+            get_placements(shape, board, cache=None)
+
+    return [
+        ('can_place/%s' % name, run_can_place, max(1, len(positions))),
+        ('drop_row/%s' % name, run_drop_row, max(1, len(drops))),
+        ('board_copy/%s' % name, board.copy, 1),
+        # on a copy, as judge_lines clears the board it is given
+        ('judge_lines/%s' % name, lambda: judge_lines(board.copy()), 1),
+        ('count_holes/%s' % name, lambda: count_holes(board), 1),
+        ('board_features/%s' % name, lambda: board_features(board), 1),
+        ('evaluate_board/%s' % name, lambda: evaluate_board(board), 1),
+        ('get_placements/%s' % name, run_placements, len(shapes)),
+    ]
+
+
+def hint_benchmarks(name, board):
+    current_block, next_block = SHAPES[PIECE_FIRST_IDS[2]], SHAPES[PIECE_FIRST_IDS[4]]
+
+    def cold_hint():
+        HINT_CACHE.clear()
+        ai_suggest_best_position(current_block, board.copy(), next_block)
+
+    def warm_hint():
+        ai_suggest_best_position(current_block, board.copy(), next_block)
+
+    return [('hint/%s' % name, cold_hint, 1), ('hint_cached/%s' % name, warm_hint, 1)]
+
+
+def play_ai_game(seed=SEED, max_pieces=GAME_PIECES):
+    """
+    headless game with the AI (depth 1, like tune.py) choosing every placement
+    """
+    game = Engine(seed)
+    while not game.game_over and game.pieces <= max_pieces:
+        _, best = search_best_position([game.current_block, game.next_block], game.board, depth=1,
+                                       cache=None)
+        if best is None:
+            break
+        game.play(best[1], best[2], best[3])
+    return game
+
+
+def play_random_game(seed=SEED):
+    """
+    headless game of random actions until it is over
+    """
+    rng = random.Random(seed)
+    game = Engine(seed)
+    while not game.game_over:
+        game.step(rng.choice(ACTIONS))
+    return game
+
+
+def game_benchmarks():
+    return [('game/ai_%d_blocks' % GAME_PIECES, play_ai_game, 1), ('game/random_actions', play_random_game, 1)]
+
+
+def frame_benchmarks(corpus):
+    """
+    cost of one frame of the game window (pygame with the dummy video driver
+    when no display is set), empty when pygame is not installed
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    try:
+        import pygame
+
+        from assets import Assets
+        from render import SCREEN_HEIGHT, SCREEN_WIDTH, Renderer
+    except ImportError:
+        return []
+
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    renderer = Renderer(screen, Assets())
+    game = Engine(SEED)
+    game.board = corpus['mid_game'].copy()
+    hint = ('AI HINT:', 1, [3, 4, 5], False)
+
+    def full_frame():
+        renderer.invalidate()
+        pygame.display.update(renderer.draw(game, hint))
+
+    moves = iter(())
+
+    def moving_frame():
+        # the falling block moves left and right, like a frame after a key press
+        nonlocal moves
+        action = next(moves, None)
+        if action is None:
+            moves = iter(['right'] * 4 + ['left'] * 4)
+            action = next(moves)
+        game.step(action)
+        rects = renderer.draw(game, hint)
+        if rects:
+            pygame.display.update(rects)
+
+    def idle_frame():
+        rects = renderer.draw(game, hint)
+        if rects:
+            pygame.display.update(rects)
+
+    return [('frame/full', full_frame, 1), ('frame/block_moved', moving_frame, 1), ('frame/unchanged', idle_frame, 1)]
+
+
+def calibration():
+    """
+    fixed pure Python work that does not depend on the game, its time tells
+    how fast the machine is at the moment
+    """
+    total = 0
+    for number in range(1000):
+        total += number * number % 7
+    return total
+
+
+def run_benchmarks(name_filter=None, repeat=REPEAT, min_time=MIN_TIME):
+    """
+    dict of benchmark name: microseconds per call
+    """
+    corpus = make_corpus()
+    groups = [[] for _ in range(4)]
+    for name, board in corpus.items():
+        groups[0] += primitive_benchmarks(name, board)
+        groups[1] += hint_benchmarks(name, board)
+    groups[2] = game_benchmarks()
+    groups[3] = frame_benchmarks(corpus)
+
+    # the calibration is timed before, between and after the groups, its median is kept
+    calibrations = [measure(calibration, repeat, min_time)]
+    results = {}
+    for group in groups:
+        for name, function, calls in group:
+            if name_filter and name_filter not in name:
+                continue
+            # games are slow and always the same work, fewer runs are enough
+            runs = 3 if name.startswith('game/') else repeat
+            results[name] = measure(function, runs, min_time) / calls * 1e6
+            print('%-32s %12.2f us' % (name, results[name]))
+        calibrations.append(measure(calibration, repeat, min_time))
+    results[CALIBRATION] = sorted(calibrations)[len(calibrations) // 2] * 1e6
+    print('%-32s %12.2f us' % (CALIBRATION, results[CALIBRATION]))
+    return results
+
+
+def machine_speed(results, baseline):
+    """
+    how much slower the machine runs the calibration than for the baseline
+    """
+    if results.get(CALIBRATION) and baseline.get(CALIBRATION):
+        return results[CALIBRATION] / baseline[CALIBRATION]
+    return 1.0
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """
+    (name, baseline us, current us, ratio) of the benchmarks slower than the
+    baseline by more than the tolerance, after correcting for the machine speed
+    """
+    speed = machine_speed(results, baseline)
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous and name != CALIBRATION:
+            ratio = current / previous / speed
+            if ratio > 1 + tolerance:
+                regressions.append((name, previous, current, ratio))
+    return regressions
+
+
+def print_comparison(results, baseline):
+    speed = machine_speed(results, baseline)
+    print('\nthe machine runs the calibration %.2fx slower than for the baseline, the changes are corrected for it'
+          % speed)
+    print('%-32s %12s %12s %8s' % ('compared with the baseline', 'baseline us', 'current us', 'change'))
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if name == CALIBRATION:
+            continue
+        if previous:
+            print('%-32s %12.2f %12.2f %+7.1f%%' % (name, previous, current, (current / previous / speed - 1) * 100))
+        else:
+            print('%-32s %12s %12.2f %8s' % (name, '-', current, 'new'))
+
+
+def load_results(path):
+    with open(path) as file:
+        return json.load(file)['results']
+
+
+def save_results(path, results):
+    with open(path, 'w') as file:
+        json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'platform': platform.platform(),
+                   'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'unit': 'us per call', 'results': results},
+                  file, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark the game rules and the AI')
+    parser.add_argument('--filter', default=None, help='only run the benchmarks whose name contains this text')
+    parser.add_argument('--json', default=RESULTS_FILE, help='file to write the results to')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='results to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='save the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='allowed slowdown before failing (0.25 = 25%%)')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='runs of every benchmark, the best one is kept')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.filter, max(1, args.repeat))
+    save_results(args.json, results)
+    if args.save_baseline:
+        save_results(args.baseline, results)
+        print('\nbaseline saved to %s' % args.baseline)
+        return
+
+    if not os.path.exists(args.baseline):
+        print('\nno baseline to compare with, save one with --save-baseline')
+        return
+    baseline = load_results(args.baseline)
+    print_comparison(results, baseline)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print('\n%d benchmark(s) more than %.0f%% slower than the baseline:' % (len(regressions),
+                                                                             args.tolerance * 100))
+        for name, previous, current, ratio in regressions:
+            print('  %s: %.2f us -> %.2f us (x%.2f)' % (name, previous, current, ratio))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
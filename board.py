@@ -0,0 +1,223 @@
+"""
+board.py
+This file holds the game board used by the Tetris game. Every row of the
+board is stored as a single integer bitmask (bit ``col`` is set when the cell
+in that column is occupied), next to a separate color plane that remembers
+the block letter of each cell for drawing. Occupancy tests, piece placement,
+full-row detection and row clearing are bitwise operations on whole rows, and
+copying a board only copies 25 integers and a 250 byte color plane.
+
+The board also keeps the height and the number of holes of every column.
+They are updated cell by cell when a block is placed and only the columns
+whose top block was on a cleared row are counted again after a line clear,
+so the AI, the renderer and the telemetry can read them for free.
+
+Authors: Yifan Qin, Kevin Abeykoon, Joanna Joy, Vivian Ma
+"""
+
+BLOCK_COL_NUM = 10
+BLOCK_ROW_NUM = 25
+FULL_ROW = (1 << BLOCK_COL_NUM) - 1
+EMPTY = ord('.')
+
+
+class Board:
+    """
+    game board with one bitmask per row and a color plane
+    """
+    __slots__ = ('rows', 'colors', 'heights', 'holes')
+
+    def __init__(self, rows=None, colors=None, heights=None, holes=None):
+        self.rows = rows if rows is not None else [0] * BLOCK_ROW_NUM
+        self.colors = colors if colors is not None else bytearray(b'.' * (BLOCK_ROW_NUM * BLOCK_COL_NUM))
+        if heights is None or holes is None:
+            self.heights = [0] * BLOCK_COL_NUM
+            self.holes = [0] * BLOCK_COL_NUM
+            for col in range(BLOCK_COL_NUM):
+                self.count_column(col)
+        else:
+            self.heights = heights
+            self.holes = holes
+
+    def copy(self):
+        """
+        cheap copy of the board (used by the AI for every candidate)
+        """
+        return Board(self.rows[:], self.colors[:], self.heights[:], self.holes[:])
+
+    def count_column(self, col):
+        """
+        count the height and the holes of one column from the rows
+        """
+        bit = 1 << col
+        height = 0
+        holes = 0
+        for row, mask in enumerate(self.rows):
+            if mask & bit:
+                if not height:
+                    height = BLOCK_ROW_NUM - row
+            elif height:
+                holes += 1
+        self.heights[col] = height
+        self.holes[col] = holes
+
+    def is_occupied(self, row, col):
+        """
+        whether the cell is taken, cells above the board are always free
+        """
+        if row < 0:
+            return False
+        return (self.rows[row] >> col) & 1 == 1
+
+    def row_fits(self, row, mask):
+        """
+        whether a row bitmask can be put on the given row without overlapping
+        """
+        if row < 0:
+            return True
+        if row >= BLOCK_ROW_NUM:
+            return False
+        return not self.rows[row] & mask
+
+    def color_at(self, row, col):
+        """
+        block letter stored in the cell ('.' when empty)
+        """
+        return chr(self.colors[row * BLOCK_COL_NUM + col])
+
+    def place_mask(self, row, mask, color):
+        """
+        fill every cell of the row bitmask with the given block letter
+        """
+        if row < 0 or not mask:
+            return
+        # only the cells that were empty change the counters (a block locked
+        # over the stack at game over overlaps filled cells)
+        empty = mask & ~self.rows[row]
+        self.rows[row] |= mask
+        offset = row * BLOCK_COL_NUM
+        letter = ord(color)
+        height = BLOCK_ROW_NUM - row
+        col = 0
+        while mask:
+            if mask & 1:
+                self.colors[offset + col] = letter
+            if empty & 1:
+                old_height = self.heights[col]
+                if height > old_height:
+                    # the empty cells between the old top and this cell become holes
+                    self.holes[col] += height - old_height - 1
+                    self.heights[col] = height
+                else:
+                    # the cell fills a hole
+                    self.holes[col] -= 1
+            mask >>= 1
+            empty >>= 1
+            col += 1
+
+    def place(self, shape, start_row, start_col):
+        """
+        put a block (an entry of pieces.SHAPES) on the board
+        """
+        shift = start_col + shape.min_col
+        for row, mask in shape.row_masks:
+            self.place_mask(start_row + row, mask << shift, shape.color)
+
+    def full_rows(self):
+        """
+        indices of the rows that are completely filled
+        """
+        return [row for row, mask in enumerate(self.rows) if mask == FULL_ROW]
+
+    def clear_full_rows(self):
+        """
+        remove the full rows, shift everything above down and return the count
+        """
+        rows = self.rows
+        if FULL_ROW not in rows:
+            return 0
+
+        kept_rows = []
+        kept_colors = bytearray()
+        for row, mask in enumerate(rows):
+            if mask != FULL_ROW:
+                kept_rows.append(mask)
+                kept_colors += self.colors[row * BLOCK_COL_NUM:(row + 1) * BLOCK_COL_NUM]
+
+        cleared = BLOCK_ROW_NUM - len(kept_rows)
+        self.rows = [0] * cleared + kept_rows
+        self.colors = bytearray(b'.' * (cleared * BLOCK_COL_NUM)) + kept_colors
+
+        # a full row is below the top of every column, so the heights drop by the
+        # cleared rows and the holes stay, unless the top block itself was cleared
+        for col, height in enumerate(self.heights):
+            if rows[BLOCK_ROW_NUM - height] == FULL_ROW:
+                self.count_column(col)
+            else:
+                self.heights[col] = height - cleared
+        return cleared
+
+    def is_empty(self):
+        return not any(self.rows)
+
+    def column_tops(self):
+        """
+        row of the highest block in every column (BLOCK_ROW_NUM when empty)
+        """
+        return [BLOCK_ROW_NUM - height for height in self.heights]
+
+    def stack_height(self):
+        return max(self.heights)
+
+    def hole_count(self):
+        return sum(self.holes)
+
+    def cells(self):
+        """
+        yield (row, col, letter) for every occupied cell, used for drawing
+        """
+        colors = self.colors
+        for row, mask in enumerate(self.rows):
+            offset = row * BLOCK_COL_NUM
+            col = 0
+            while mask:
+                if mask & 1:
+                    yield row, col, chr(colors[offset + col])
+                mask >>= 1
+                col += 1
+
+
+def can_place(piece, row, col, board):
+    """
+    whether the piece (an entry of pieces.SHAPES) fits at (row, col): inside
+    the walls, above the floor and not overlapping any block. Cells above the
+    top of the board are always free.
+    """
+    shift = col + piece.min_col
+    if shift < 0 or col + piece.max_col >= BLOCK_COL_NUM:
+        return False
+    rows = board.rows
+    for offset, mask in piece.row_masks:
+        board_row = row + offset
+        if board_row >= BLOCK_ROW_NUM:
+            return False
+        if board_row >= 0 and rows[board_row] & (mask << shift):
+            return False
+    return True
+
+
+def drop_row(piece, row, col, board):
+    """
+    row the piece lands on when it falls straight down from (row, col)
+    """
+    heights = board.heights
+    landing = BLOCK_ROW_NUM
+    for offset, bottom in enumerate(piece.bottom):
+        top = BLOCK_ROW_NUM - heights[col + piece.min_col + offset]
+        if row + bottom >= top:
+            # the piece is already under an overhang, walk down instead
+            while can_place(piece, row + 1, col, board):
+                row += 1
+            return row
+        landing = min(landing, top - bottom - 1)
+    return landing
@@ -0,0 +1,194 @@
+"""
+capture.py
+This file holds the threads of the gesture pipeline used by
+hand_gesture_recognition.py. The camera is read on its own thread and every
+frame is put in a latest-frame-wins slot: when the model is still busy with
+the previous frame, the waiting frame is replaced instead of queued, so the
+model always works on the newest image and a slow frame never builds up a
+backlog. The model runs on a second thread that writes its results to
+another slot, which the display (when there is one) picks up at its own
+pace. The throughput is then limited by the slowest stage (the model)
+instead of the sum of all stages. Nothing here depends on OpenCV or
+MediaPipe, the stages are plain functions.
+
+To save CPU on slow machines the model can run at a lower rate while no
+hand is in the picture (AdaptiveRate): after a few seconds without a hand
+only a few frames per second are processed, and the full rate is back on
+the first frame that shows a hand. PipelineStats reports the frame rates and
+the CPU time spent per processed frame, to tune these settings.
+
+Authors: Yifan Qin, Kevin Abeykoon, Joanna Joy, Vivian Ma
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+# seconds without a hand before the model slows down, and its rate then
+IDLE_AFTER = 2.0
+IDLE_FPS = 5.0
+
+# index: number of the frame since the start, time: time.time() of the
+# capture, image: the camera image
+Frame = namedtuple('Frame', ['index', 'time', 'image'])
+
+
+class LatestSlot:
+    """
+    buffer of one item, a new item replaces the one that was not taken yet
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.item = None
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self.condition:
+            if self.item is not None:
+                self.dropped += 1
+            self.item = item
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        """
+        take the newest item, waits for one; None when closed or timed out
+        """
+        with self.condition:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while self.item is None and not self.closed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+            item, self.item = self.item, None
+            return item
+
+    def close(self):
+        """
+        wake up every reader, get() returns None once the slot is empty
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class CaptureThread(threading.Thread):
+    """
+    reads frames with read() (returns an image, or None at the end) into a slot
+    """
+
+    def __init__(self, read, frames):
+        super().__init__(name='camera-capture', daemon=True)
+        self.read = read
+        self.frames = frames
+        self.stopped = threading.Event()
+        self.captured = 0
+
+    def run(self):
+        try:
+            while not self.stopped.is_set():
+                image = self.read()
+                if image is None:
+                    break
+                self.frames.put(Frame(self.captured, time.time(), image))
+                self.captured += 1
+        finally:
+            self.frames.close()
+
+    def stop(self):
+        self.stopped.set()
+
+
+class AdaptiveRate:
+    """
+    full processing rate while a hand is seen, idle_fps after idle_after
+    seconds without one
+    """
+
+    def __init__(self, idle_after=IDLE_AFTER, idle_fps=IDLE_FPS):
+        self.idle_after = idle_after
+        self.idle_interval = 1.0 / idle_fps
+        self.last_hand = time.time()
+
+    def update(self, hand_seen, now):
+        if hand_seen:
+            self.last_hand = now
+
+    def idle(self, now=None):
+        now = time.time() if now is None else now
+        return now - self.last_hand >= self.idle_after
+
+    def delay(self):
+        """
+        seconds to wait before the next frame is taken
+        """
+        return self.idle_interval if self.idle() else 0.0
+
+
+class WorkerThread(threading.Thread):
+    """
+    applies process(item) to the newest item of one slot and puts the result
+    in another slot (None results are not passed on), waits between the items
+    when a rate (AdaptiveRate) asks for it
+    """
+
+    def __init__(self, process, inputs, outputs=None, rate=None, name='gesture-inference'):
+        super().__init__(name=name, daemon=True)
+        self.process = process
+        self.inputs = inputs
+        self.outputs = outputs
+        self.rate = rate
+        self.processed = 0
+        self.busy = 0.0  # seconds spent in process()
+        self.cpu = 0.0  # CPU seconds of this thread spent in process()
+
+    def run(self):
+        try:
+            while True:
+                item = self.inputs.get()
+                if item is None:
+                    break
+                started, started_cpu = time.perf_counter(), time.thread_time()
+                result = self.process(item)
+                self.busy += time.perf_counter() - started
+                self.cpu += time.thread_time() - started_cpu
+                self.processed += 1
+                if result is not None and self.outputs is not None:
+                    self.outputs.put(result)
+                if self.rate is not None:
+                    # the frames captured meanwhile are replaced in the slot, the newest one is taken next
+                    time.sleep(self.rate.delay())
+        finally:
+            if self.outputs is not None:
+                self.outputs.close()
+
+
+class PipelineStats:
+    """
+    frame rates and CPU use of the pipeline since the previous report
+    """
+
+    def __init__(self, capture, worker):
+        self.capture = capture
+        self.worker = worker
+        self.last = self.snapshot()
+
+    def snapshot(self):
+        return (time.time(), time.process_time(), self.capture.captured, self.worker.processed, self.worker.cpu)
+
+    def report(self):
+        """
+        dict of the rates since the previous report
+        """
+        now = self.snapshot()
+        seconds, process_cpu, captured, processed, worker_cpu = (b - a for a, b in zip(self.last, now))
+        self.last = now
+        seconds = max(seconds, 1e-9)
+        return {'capture_fps': captured / seconds,
+                'process_fps': processed / seconds,
+                # CPU of the model thread, and of the whole program (the model may use threads of its own)
+                'cpu_ms_per_frame': worker_cpu / processed * 1000 if processed else 0.0,
+                'process_cpu_ms_per_frame': process_cpu / processed * 1000 if processed else 0.0,
+                'process_cpu_percent': process_cpu / seconds * 100}
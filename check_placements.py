@@ -0,0 +1,99 @@
+"""
+check_placements.py
+This program checks the placement search of the AI hint (ai.get_placements)
+against a plain search that starts where a block appears and tries every
+move of the game (left, right, rotate, one row down) on every position,
+without the shortcut over the free rows above the stack. It runs both on
+the benchmark boards (bench.py) and on many random boards with overhangs,
+for every block in every starting rotation, and prints the boards where
+the two disagree. Run it after changing get_placements.
+
+Authors: Yifan Qin, Kevin Abeykoon, Joanna Joy, Vivian Ma
+
+Notes:
+>>> python3 check_placements.py
+>>> python3 check_placements.py --boards 3000 --seed 7
+"""
+
+import argparse
+import random
+import sys
+
+from ai import get_placements
+from bench import board_from_rows, make_corpus
+from board import BLOCK_COL_NUM, BLOCK_ROW_NUM, FULL_ROW, can_place
+from engine import START_COL, START_ROW
+from pieces import SHAPES, rotate
+
+
+def plain_placements(block, board):
+    """
+    resting positions (shape id, row, column) reachable from where the block appears
+    """
+    if not can_place(block, START_ROW, START_COL, board):
+        return set()
+    seen = {(block.id, START_ROW, START_COL)}
+    frontier = [(block, START_ROW, START_COL)]
+    resting = set()
+    while frontier:
+        shape, row, col = frontier.pop()
+        if not can_place(shape, row + 1, col, board):
+            resting.add((shape.id, row, col))
+        for next_shape, next_row, next_col in ((shape, row + 1, col), (shape, row, col - 1), (shape, row, col + 1),
+                                               (rotate(shape), row, col)):
+            state = (next_shape.id, next_row, next_col)
+            if state not in seen and can_place(next_shape, next_row, next_col, board):
+                seen.add(state)
+                frontier.append((next_shape, next_row, next_col))
+    return resting
+
+
+def random_board(rng):
+    """
+    board with a random stack height, random cells (sparse or dense rows) and no full row
+    """
+    height = rng.randrange(BLOCK_ROW_NUM - 2)
+    rows = [0] * BLOCK_ROW_NUM
+    for row in range(BLOCK_ROW_NUM - height, BLOCK_ROW_NUM):
+        mask = FULL_ROW
+        while mask == FULL_ROW:
+            mask = rng.getrandbits(BLOCK_COL_NUM)
+            if rng.random() < 0.5:
+                mask &= rng.getrandbits(BLOCK_COL_NUM)
+        rows[row] = mask
+    return board_from_rows(rows)
+
+
+def check_board(board):
+    """
+    ids of the shapes whose placements differ from the plain search
+    """
+    differences = []
+    for shape in SHAPES:
+        found = {(placed.id, row, col) for _, placed, col, row in get_placements(shape, board, cache=None)}
+        if found != plain_placements(shape, board):
+            differences.append(shape.id)
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description='check ai.get_placements against a plain search')
+    parser.add_argument('--boards', type=int, default=300, help='random boards to check')
+    parser.add_argument('--seed', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    boards = list(make_corpus().values()) + [random_board(rng) for _ in range(args.boards)]
+    failures = 0
+    for index, board in enumerate(boards):
+        differences = check_board(board)
+        if differences:
+            failures += 1
+            print('board %d: shapes %s differ, rows %s' % (index, differences, board.rows))
+    print('%d boards checked, %d with differences' % (len(boards), failures))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+engine.py
+This file holds the rules of the Tetris game without any pygame code: block
+generation, movement, rotation, gravity, line clearing, scoring and speed.
+The Engine class keeps the whole state of one game and is advanced with
+step(action), so the same rules can drive the pygame window in tetris.py or
+run headless (AI evaluation, tuning, replays) as fast as the CPU allows.
+Block generation uses the engine's own random generator, so two engines
+created with the same seed and fed the same actions play the same game.
+
+Authors: Yifan Qin, Kevin Abeykoon, Joanna Joy, Vivian Ma
+"""
+
+import random
+
+from board import Board, can_place, drop_row
+from pieces import BLOCK_STYLE_LIST, rotate, shape_of
+
+# the location of the new block generation
+START_ROW = -2  # on the top (unseen)
+START_COL = 0
+
+# rows moved by one soft drop ('down')
+SOFT_DROP_ROWS = 2
+
+# left / right / up (rotate) / down (soft drop) come from the keyboard or the
+# gestures, tick is one step of gravity and drop is a hard drop
+ACTIONS = ('left', 'right', 'up', 'down', 'tick', 'drop')
+
+
+def judge_game_over(board):
+    """
+    check whether the game is over
+    """
+    return board.rows[0] != 0
+
+
+def change_speed(score):
+    speed_level = [("1", 0.5, 0, 20), ("2", 0.4, 21, 50), ("3", 0.3, 51, 100), ("4", 0.2, 101, 200),
+                   ("5", 0.1, 201, None)]
+    for speed_info, speed, score_start, score_stop in speed_level:
+        if score_stop and score_start <= score <= score_stop:
+            return speed_info, speed
+        elif score_stop is None and score >= score_start:
+            return speed_info, speed
+
+
+def judge_lines(board):
+    """
+    update the score and clean up the lines
+    """
+    return board.clear_full_rows() * 10
+
+
+def add_to_stop_all_block_list(board, current_block, current_block_start_row, current_block_start_col):
+    """
+    update the game board
+    """
+    board.place(current_block, current_block_start_row, current_block_start_col)
+
+
+def change_current_block_style(current_block):
+    """
+    rotate the block
+    """
+    return rotate(current_block)
+
+
+def get_block(rng=random):
+    """
+    generate a new block
+    """
+    block_style_list = rng.choice(BLOCK_STYLE_LIST)
+    return shape_of(rng.choice(block_style_list))
+
+
+class Engine:
+    """
+    state of one game, advanced with step(action)
+    """
+
+    def __init__(self, seed=None):
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        """
+        start a new game
+        """
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.board = Board()
+        self.score = 0
+        self.lines = 0
+        self.pieces = 0
+        self.speed_info, self.speed = change_speed(self.score)
+        self.game_over = False
+        self.current_block = None
+        self.next_block = get_block(self.rng)
+        self.spawn()
+
+    def spawn(self):
+        """
+        the next block becomes the current block at the top of the board
+        """
+        self.current_block = self.next_block
+        self.next_block = get_block(self.rng)
+        self.row = START_ROW
+        self.col = START_COL
+        self.pieces += 1
+
+    def lock(self):
+        """
+        put the current block on the board, clean the lines and spawn a new block
+        """
+        add_to_stop_all_block_list(self.board, self.current_block, self.row, self.col)
+        points = judge_lines(self.board)
+        self.score += points
+        self.lines += points // 10
+        self.game_over = judge_game_over(self.board)
+        self.speed_info, self.speed = change_speed(self.score)
+        self.spawn()
+
+    def step(self, action):
+        """
+        apply one action, return whether the game state changed
+        """
+        if self.game_over:
+            return False
+
+        block, row, col, board = self.current_block, self.row, self.col, self.board
+        if action == 'left':
+            if can_place(block, row, col - 1, board):
+                self.col -= 1
+                return True
+        elif action == 'right':
+            if can_place(block, row, col + 1, board):
+                self.col += 1
+                return True
+        elif action == 'up':
+            next_style = change_current_block_style(block)
+            if can_place(next_style, row, col, board):
+                self.current_block = next_style
+                return True
+        elif action == 'down':
+            landing = min(row + SOFT_DROP_ROWS, drop_row(block, row, col, board))
+            if landing != row:
+                self.row = landing
+                return True
+        elif action == 'tick':
+            if can_place(block, row + 1, col, board):
+                self.row += 1
+            else:
+                self.lock()
+            return True
+        elif action == 'drop':
+            self.row = drop_row(block, row, col, board)
+            self.lock()
+            return True
+        else:
+            raise ValueError('unknown action: %r' % (action,))
+        return False
+
+    def play(self, shape, col, row=None):
+        """
+        hard drop the given rotation of the current block in a column and
+        lock it (used by headless simulations that choose placements directly);
+        with a row, lock it there instead (a resting position found by
+        ai.get_placements, e.g. under an overhang)
+        """
+        if self.game_over:
+            return False
+        if row is None:
+            if not can_place(shape, self.row, col, self.board):
+                return False
+            row = drop_row(shape, self.row, col, self.board)
+        elif not can_place(shape, row, col, self.board) or can_place(shape, row + 1, col, self.board):
+            return False
+        self.current_block = shape
+        self.row = row
+        self.col = col
+        self.lock()
+        return True
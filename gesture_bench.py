@@ -0,0 +1,237 @@
+"""
+gesture_bench.py
+This program checks the gesture classifier (gestures.py) for speed and
+accuracy without a camera. hand_gesture_recognition.py can record a session
+with --record: the landmarks of every frame, the capture time and an
+optional label (the gesture the player was really showing, set with the
+number keys while recording) are saved to a compressed .npz file. This
+program replays recorded sessions through the classifier and the debouncer
+and reports the time per frame, the throughput of one-by-one and batch
+classification, a confusion matrix of the labelled frames and the commands
+the debouncer would have sent. It only needs NumPy, so it runs anywhere,
+e.g. before committing a change to the gesture rules.
+
+Authors: Yifan Qin, Kevin Abeykoon, Joanna Joy, Vivian Ma
+
+Notes:
+>>> python3 hand_gesture_recognition.py --record session.npz (keys 1-6 label the frames, 0 clears the label)
+>>> python3 gesture_bench.py session.npz other_session.npz
+>>> python3 gesture_bench.py session.npz --json results.json
+>>> python3 gesture_bench.py --check (check the debouncer on scripted frame sequences)
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import Counter, namedtuple
+
+import numpy as np
+
+from gestures import GESTURES, UNIDENTIFIED, GestureDebouncer, classify, classify_batch, confidences
+from latency import percentile
+
+# times: (frames,) capture times, points: (frames, 21, 3) landmarks (NaN when
+# there was no hand), labels: (frames,) gesture shown ('' when unlabelled)
+Session = namedtuple('Session', ['times', 'points', 'labels'])
+
+CLASSES = GESTURES + (UNIDENTIFIED,)
+
+
+class SessionRecorder:
+    """
+    collects the landmarks of a live session, the label can be changed at any time
+    """
+
+    def __init__(self):
+        self.times = []
+        self.points = []
+        self.labels = []
+        self.label = ''
+
+    def __len__(self):
+        return len(self.times)
+
+    def add(self, capture_time, points):
+        """
+        landmarks (21, 3) of one frame, None when there was no hand
+        """
+        self.times.append(capture_time)
+        self.points.append(np.full((21, 3), np.nan, dtype=np.float32) if points is None else points)
+        self.labels.append(self.label)
+
+    def save(self, path):
+        np.savez_compressed(path, times=np.array(self.times, dtype=np.float64),
+                            points=np.array(self.points, dtype=np.float32).reshape(-1, 21, 3),
+                            labels=np.array(self.labels, dtype=str))
+
+
+def load_session(path):
+    with np.load(path) as data:
+        return Session(data['times'], data['points'], data['labels'])
+
+
+def hand_frames(session):
+    """
+    boolean mask of the frames with a hand
+    """
+    return ~np.isnan(session.points).any(axis=(1, 2))
+
+
+def time_per_frame(points):
+    """
+    seconds of classify() for every frame, one by one like the live program
+    """
+    durations = []
+    for frame in points:
+        started = time.perf_counter()
+        classify(frame)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def time_batch(points, repeat=5):
+    """
+    best seconds of classify_batch() over the whole batch
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        classify_batch(points)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def confusion_matrix(labels, predicted):
+    """
+    counts[true class][predicted class] of the labelled frames
+    """
+    matrix = np.zeros((len(CLASSES), len(CLASSES)), dtype=np.int64)
+    for label, gesture in zip(labels, predicted):
+        if label:
+            matrix[CLASSES.index(label), CLASSES.index(gesture)] += 1
+    return matrix
+
+
+def replay_commands(session, debouncer=None):
+    """
+    (time, gesture) of every command the debouncer sends during the session
+    """
+    debouncer = debouncer or GestureDebouncer()
+    present = hand_frames(session)
+    scores = confidences(np.nan_to_num(session.points))
+    commands = []
+    for capture_time, hand, frame_scores in zip(session.times, present, scores):
+        gesture = debouncer.update(frame_scores if hand else None, capture_time)
+        if gesture is not None:
+            commands.append((float(capture_time), gesture))
+    return commands
+
+
+def check_debouncer():
+    """
+    commands of short scripted sequences that must not change, returns the
+    failures as text (empty when everything is right)
+    """
+    def scores(name):
+        if name is None:
+            return None
+        frame = np.zeros(len(GESTURES), dtype=np.float32)
+        frame[GESTURES.index(name)] = 1
+        return frame
+
+    # frames 33 ms apart: expected gesture (or None) after every frame
+    cases = [
+        ('flicker', ['up', None, 'up'], ['up', None, None]),
+        ('flicker', ['openpalm', None, 'openpalm'], ['openpalm', None, None]),
+        ('flicker', ['left', None, 'left'], ['left', None, None]),
+        ('released', ['up', None, None, 'up'], ['up', None, None, 'up']),
+        ('change', ['left', 'right'], ['left', 'right']),
+    ]
+    failures = []
+    for name, frames, expected in cases:
+        debouncer = GestureDebouncer()
+        sent = [debouncer.update(scores(frame), index / 30) for index, frame in enumerate(frames)]
+        if sent != expected:
+            failures.append('%s %s: sent %s, expected %s' % (name, frames, sent, expected))
+    return failures
+
+
+def bench_session(session):
+    """
+    timing, accuracy and replay results of one session as a dict
+    """
+    present = hand_frames(session)
+    points = session.points[present]
+    labels = session.labels[present]
+    result = {'frames': len(session.times), 'hand_frames': int(present.sum())}
+    if not len(points):
+        return result
+
+    durations = sorted(time_per_frame(points))
+    batch_seconds = time_batch(points)
+    predicted = classify_batch(points)
+    matrix = confusion_matrix(labels, predicted)
+    labelled = int(matrix.sum())
+
+    result.update({
+        'per_frame_us': {'mean': sum(durations) / len(durations) * 1e6,
+                         'p50': percentile(durations, 0.50) * 1e6,
+                         'p99': percentile(durations, 0.99) * 1e6},
+        'frames_per_second': len(durations) / sum(durations),
+        'batch_frames_per_second': len(points) / batch_seconds,
+        'predicted': dict(Counter(predicted)),
+        'labelled_frames': labelled,
+        'accuracy': float(np.trace(matrix)) / labelled if labelled else None,
+        'confusion': matrix.tolist(),
+        'commands': dict(Counter(gesture for _, gesture in replay_commands(session))),
+    })
+    return result
+
+
+def print_result(path, result):
+    print('%s: %d frames, %d with a hand' % (path, result['frames'], result['hand_frames']))
+    if 'per_frame_us' not in result:
+        return
+    per_frame = result['per_frame_us']
+    print('  classify: %.1f us per frame (p50 %.1f, p99 %.1f), %.0f frames/s one by one, %.0f frames/s batched'
+          % (per_frame['mean'], per_frame['p50'], per_frame['p99'],
+             result['frames_per_second'], result['batch_frames_per_second']))
+    print('  commands sent after debouncing: %s' % (result['commands'] or 'none'))
+    if result['labelled_frames']:
+        print('  accuracy: %.1f%% of %d labelled frames' % (result['accuracy'] * 100, result['labelled_frames']))
+        width = max(len(name) for name in CLASSES)
+        header = 'true \\ predicted'
+        print('  %*s  %s' % (len(header), header, ' '.join('%*s' % (width, name) for name in CLASSES)))
+        for name, row in zip(CLASSES, result['confusion']):
+            if any(row):
+                print('  %*s  %s' % (len(header), name, ' '.join('%*d' % (width, count) for count in row)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='replay recorded gesture sessions through the classifier')
+    parser.add_argument('sessions', nargs='*', help='.npz files written by hand_gesture_recognition.py --record')
+    parser.add_argument('--json', default=None, help='also write the results to this file')
+    parser.add_argument('--check', action='store_true', help='check the debouncer on scripted sequences first')
+    args = parser.parse_args()
+
+    if args.check:
+        failures = check_debouncer()
+        for failure in failures:
+            print('debouncer check failed: %s' % failure)
+        if failures:
+            sys.exit(1)
+        print('debouncer checks passed')
+
+    results = {}
+    for path in args.sessions:
+        results[path] = bench_session(load_session(path))
+        print_result(path, results[path])
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'classes': CLASSES, 'sessions': results}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+"""
+gestures.py
+This file classifies the hand landmarks found by MediaPipe into the gesture
+commands of the Tetris game. The 21 landmarks of a hand are stored in one
+NumPy array of shape (21, 3) (x, y, z in image coordinates), and every
+gesture is a list of ordering rules between two landmarks along one axis,
+e.g. "the index finger tip is right of its knuckle". All rules of all
+gestures are turned once into a single constraint matrix with +1 / -1 per
+rule, so checking every rule of every gesture is one matrix product instead
+of a chain of Python comparisons. The confidence of a gesture is the
+fraction of its rules that hold; the gesture is recognized when all of its
+rules hold (like the original comparisons, the first gesture of the table
+wins a tie). A batch of recorded frames of shape (frames, 21, 3) is
+classified in the same single pass, for offline evaluation.
+
+The commands are not sent for every frame: GestureDebouncer keeps a moving
+average of the recognized gesture of every frame and only starts a gesture
+once it has been seen for a couple of frames (or at once when the frame
+matches it without any doubt). It ends the gesture when the average drops
+far enough, so single bad frames neither start nor interrupt a gesture, and
+it repeats a held left / right / down like a held key.
+
+Authors: Kevin Abeykoon, Yifan Qin
+
+Notes:
+The rules are the original comparisons of hand_gesture_recognition.py, a
+rule "y: A < B < C" stands for A.y < B.y and B.y < C.y.
+"""
+
+import numpy as np
+
+LANDMARKS = ('WRIST',
+             'THUMB_CMC', 'THUMB_MCP', 'THUMB_IP', 'THUMB_TIP',
+             'INDEX_FINGER_MCP', 'INDEX_FINGER_PIP', 'INDEX_FINGER_DIP', 'INDEX_FINGER_TIP',
+             'MIDDLE_FINGER_MCP', 'MIDDLE_FINGER_PIP', 'MIDDLE_FINGER_DIP', 'MIDDLE_FINGER_TIP',
+             'RING_FINGER_MCP', 'RING_FINGER_PIP', 'RING_FINGER_DIP', 'RING_FINGER_TIP',
+             'PINKY_MCP', 'PINKY_PIP', 'PINKY_DIP', 'PINKY_TIP')
+LANDMARK_INDEX = {name: index for index, name in enumerate(LANDMARKS)}
+AXES = ('x', 'y', 'z')
+
+UNIDENTIFIED = 'Unidentified'
+
+# debouncing: weight of the newest frame in the moving average of the votes
+EMA_ALPHA = 0.5
+# the average a gesture needs to start, and below which a held gesture ends
+ENTER_THRESHOLD = 0.7
+LEAVE_THRESHOLD = 0.3
+# a frame that fully matches a gesture while no other gesture is above this
+# confidence starts the gesture at once
+CONFIDENT_RUNNER_UP = 0.6
+# auto-repeat of held gestures, in seconds
+REPEAT_DELAY = 0.4
+REPEAT_INTERVAL = 0.15
+REPEAT_GESTURES = ('left', 'right', 'down')
+
+# the thumb points up / down with the other fingers curled towards the left of the image
+_FINGERS_CURLED = ('x: INDEX_FINGER_PIP > INDEX_FINGER_TIP',
+                   'x: MIDDLE_FINGER_PIP > MIDDLE_FINGER_TIP',
+                   'x: RING_FINGER_PIP > RING_FINGER_TIP',
+                   'x: PINKY_PIP > PINKY_TIP > WRIST')
+
+# in the order they are checked, the first gesture wins a tie
+GESTURE_RULES = (
+    # Hand is pointing left
+    ('left', ('x: INDEX_FINGER_TIP > INDEX_FINGER_MCP > WRIST',
+              'x: INDEX_FINGER_PIP > MIDDLE_FINGER_TIP',
+              'x: INDEX_FINGER_PIP > RING_FINGER_TIP',
+              'x: INDEX_FINGER_PIP > PINKY_TIP',
+              'y: INDEX_FINGER_MCP < MIDDLE_FINGER_MCP',
+              'y: INDEX_FINGER_MCP < RING_FINGER_MCP',
+              'y: INDEX_FINGER_MCP < PINKY_MCP',
+              'y: WRIST < PINKY_MCP',
+              'y: THUMB_TIP > INDEX_FINGER_MCP',
+              'y: WRIST > INDEX_FINGER_TIP')),
+    # Hand is pointing right
+    ('right', ('x: WRIST > THUMB_CMC > THUMB_MCP > THUMB_IP > THUMB_TIP',
+               'x: PINKY_MCP > INDEX_FINGER_MCP > THUMB_IP',
+               'y: WRIST > INDEX_FINGER_MCP',
+               'y: WRIST > MIDDLE_FINGER_MCP',
+               'y: WRIST > RING_FINGER_MCP',
+               'y: WRIST > PINKY_MCP',
+               'y: INDEX_FINGER_TIP > INDEX_FINGER_MCP',
+               'y: MIDDLE_FINGER_TIP > MIDDLE_FINGER_MCP',
+               'y: RING_FINGER_TIP > RING_FINGER_MCP',
+               'y: PINKY_TIP > PINKY_MCP')),
+    # Hand is pointing up
+    ('up', _FINGERS_CURLED + ('y: THUMB_TIP < THUMB_IP < THUMB_MCP < THUMB_CMC < WRIST < PINKY_TIP',)),
+    # Hand is pointing down
+    ('down', _FINGERS_CURLED + ('y: THUMB_TIP > THUMB_IP > THUMB_MCP > THUMB_CMC > WRIST > PINKY_TIP',)),
+    # Hand is a closed fist
+    ('closedfist', ('y: WRIST > THUMB_MCP',
+                    'y: WRIST > INDEX_FINGER_MCP',
+                    'y: WRIST > MIDDLE_FINGER_MCP',
+                    'y: WRIST > RING_FINGER_MCP',
+                    'y: WRIST > PINKY_MCP',
+                    'y: THUMB_MCP > INDEX_FINGER_MCP',
+                    'y: THUMB_MCP > MIDDLE_FINGER_MCP',
+                    'y: THUMB_MCP > RING_FINGER_MCP',
+                    'y: THUMB_MCP > PINKY_MCP',
+                    'x: PINKY_MCP > RING_FINGER_MCP > MIDDLE_FINGER_MCP > INDEX_FINGER_MCP',
+                    'x: THUMB_TIP > THUMB_IP',
+                    'x: PINKY_MCP > THUMB_CMC')),
+    # Hand is an open palm
+    ('openpalm', ('y: PINKY_TIP < PINKY_DIP < PINKY_PIP < PINKY_MCP',
+                  'y: RING_FINGER_TIP < RING_FINGER_DIP < RING_FINGER_PIP < RING_FINGER_MCP',
+                  'y: MIDDLE_FINGER_TIP < MIDDLE_FINGER_DIP < MIDDLE_FINGER_PIP < MIDDLE_FINGER_MCP',
+                  'y: INDEX_FINGER_TIP < INDEX_FINGER_DIP < INDEX_FINGER_PIP < INDEX_FINGER_MCP',
+                  'y: THUMB_TIP < THUMB_IP < THUMB_MCP < THUMB_CMC < WRIST')),
+)
+GESTURES = tuple(name for name, _ in GESTURE_RULES)
+
+
+def parse_rule(rule):
+    """
+    (axis, greater landmark, smaller landmark) pairs of a rule like "x: A > B > C"
+    """
+    axis, chain = rule.split(':')
+    axis = AXES.index(axis.strip())
+    op = '>' if '>' in chain else '<'
+    names = [name.strip() for name in chain.split(op)]
+    pairs = []
+    for first, second in zip(names, names[1:]):
+        if op == '<':
+            first, second = second, first
+        pairs.append((axis, LANDMARK_INDEX[first], LANDMARK_INDEX[second]))
+    return pairs
+
+
+def build_constraints(gesture_rules=GESTURE_RULES):
+    """
+    constraint matrix (63, rules): column k is +1 at the greater and -1 at the
+    smaller coordinate of rule k in a flattened (21, 3) array, and the
+    membership matrix (rules, gestures) that averages the rules of every gesture
+    """
+    pairs = []
+    owners = []
+    for gesture, (_, rules) in enumerate(gesture_rules):
+        for rule in rules:
+            for pair in parse_rule(rule):
+                pairs.append(pair)
+                owners.append(gesture)
+
+    constraints = np.zeros((len(LANDMARKS) * len(AXES), len(pairs)), dtype=np.float32)
+    for k, (axis, greater, smaller) in enumerate(pairs):
+        constraints[greater * len(AXES) + axis, k] += 1
+        constraints[smaller * len(AXES) + axis, k] -= 1
+
+    membership = np.zeros((len(pairs), len(gesture_rules)), dtype=np.float32)
+    membership[np.arange(len(pairs)), owners] = 1
+    membership /= membership.sum(axis=0)
+    return constraints, membership
+
+
+CONSTRAINTS, MEMBERSHIP = build_constraints()
+
+
+def landmarks_array(landmarks):
+    """
+    (21, 3) array of MediaPipe landmarks (anything with x, y and z)
+    """
+    return np.fromiter([value for point in landmarks for value in (point.x, point.y, point.z)],
+                       np.float32, len(LANDMARKS) * len(AXES)).reshape(len(LANDMARKS), len(AXES))
+
+
+def confidences(points):
+    """
+    fraction of the rules of every gesture that hold: (gestures,) for one
+    hand of shape (21, 3), (frames, gestures) for a batch of shape (frames, 21, 3)
+    """
+    points = np.asarray(points, dtype=np.float32)
+    flat = points.reshape(points.shape[:-2] + (-1,))
+    satisfied = (flat @ CONSTRAINTS) > 0
+    return satisfied.astype(np.float32) @ MEMBERSHIP
+
+
+def classify_batch(points, min_confidence=1.0):
+    """
+    gesture name of every frame of a (frames, 21, 3) batch
+    """
+    scores = confidences(points)
+    best = scores.argmax(axis=-1)  # the first gesture wins a tie
+    recognized = scores[np.arange(len(scores)), best] >= min_confidence
+    return [GESTURES[index] if ok else UNIDENTIFIED for index, ok in zip(best, recognized)]
+
+
+def classify(points, min_confidence=1.0):
+    """
+    gesture name of one hand of shape (21, 3)
+    """
+    scores = confidences(points)
+    best = int(scores.argmax())
+    return GESTURES[best] if scores[best] >= min_confidence else UNIDENTIFIED
+
+
+class GestureDebouncer:
+    """
+    turns the per-frame confidences into gesture commands: an exponential
+    moving average of the frame votes with hysteresis, auto-repeat for held
+    gestures and immediate emission of an unambiguous new gesture
+    """
+
+    def __init__(self, alpha=EMA_ALPHA, enter=ENTER_THRESHOLD, leave=LEAVE_THRESHOLD,
+                 confident=CONFIDENT_RUNNER_UP, repeat_delay=REPEAT_DELAY, repeat_interval=REPEAT_INTERVAL,
+                 repeat=REPEAT_GESTURES, min_confidence=1.0):
+        self.alpha = alpha
+        self.enter = enter
+        self.leave = leave
+        self.confident = confident
+        self.repeat_delay = repeat_delay
+        self.repeat_interval = repeat_interval
+        self.repeat = {GESTURES.index(name) for name in repeat}
+        self.min_confidence = min_confidence
+        self.reset()
+
+    def reset(self):
+        self.average = np.zeros(len(GESTURES), dtype=np.float32)
+        self.active = None  # index of the gesture being held
+        self.next_repeat = None
+
+    def update(self, scores, now):
+        """
+        feed the confidences of one frame (None when there is no hand),
+        returns the gesture to send or None
+        """
+        votes = np.zeros(len(GESTURES), dtype=np.float32)
+        confident = None
+        if scores is not None:
+            best = int(scores.argmax())
+            if scores[best] >= self.min_confidence:
+                votes[best] = 1
+                runner_up = np.delete(scores, best).max()
+                if runner_up <= self.confident:
+                    confident = best
+        self.average += self.alpha * (votes - self.average)
+
+        # a clear new gesture does not wait for the average
+        if confident is not None and confident != self.active:
+            return self.start(confident, now)
+
+        if self.active is not None and self.average[self.active] < self.leave:
+            self.active = None
+
+        candidate = int(self.average.argmax())
+        if candidate != self.active and self.average[candidate] >= self.enter:
+            return self.start(candidate, now)
+
+        # held gesture: repeat like a held key
+        if self.active in self.repeat and now >= self.next_repeat:
+            self.next_repeat = max(self.next_repeat + self.repeat_interval, now)
+            return GESTURES[self.active]
+        return None
+
+    def start(self, gesture, now):
+        # a gesture sent on one confident frame gets the average of a held one,
+        # so a single missing frame does not release it and send it again
+        self.average[gesture] = max(self.average[gesture], self.enter)
+        self.active = gesture
+        self.next_repeat = now + self.repeat_delay
+        return GESTURES[gesture]
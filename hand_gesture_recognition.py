@@ -2,13 +2,18 @@
 hand_gesture_recognition.py
 Summary: This program uses MediaPipe from Google Developers to map a graph
 of 21 landmarks (points) on a hand in a live webcam stream. It then
-recognizes the gesture and prints the gesture in a text file which is
-later used by the Tetris file. It recognizes the gestures through a
-series of set comparisons, it determines the gesture to be one of the
+recognizes the gesture and sends it to the Tetris game through the command
+transport (transport.py). It recognizes the gestures through a
+series of set comparisons (gestures.py), it determines the gesture to be one of the
 following: [right, left, up, down, openfist, closedfist, unidentified].
 Please note there are special ways of depicting this gestures; right
 down, and up are conveyed through a Thumbs Up in the respective directions.
 Left is done by an extended index finger and retracted all other fingers.
+A gesture is sent once it is stable over a few frames, and held left, right
+and down gestures repeat like a held key.
+The camera, the model and the window run on separate threads (capture.py):
+the model always takes the newest frame and frames it is too slow for are
+dropped, and the window only shows the frames it has time for.
 
 Authors: Kevin Abeykoon, Yifan Qin
 
@@ -17,199 +22,199 @@ Citations: The later half of this program and gesture recognition is based off t
 2. https://github.com/google-ai-edge/mediapipe/blob/master/docs/solutions/hands.md
 
 Notes:
-In order to run the program, 2 packages must be installed, to do so, run the following lines:
+In order to run the program, these packages must be installed, to do so, run the following lines:
 1. pip install opencv-python
 2. pip install mediapipe
+3. pip install numpy (installed with mediapipe)
+Then run:
+>>> python3 hand_gesture_recognition.py (--camera 0 for another camera, --no-display without the window)
+>>> python3 hand_gesture_recognition.py --adaptive --stats (less CPU on slow machines, prints the CPU per frame)
+>>> python3 hand_gesture_recognition.py --record session.npz --label left (record for gesture_bench.py)
 """
 
+import argparse # For the command line options
 import cv2 # For camera interaction
 import mediapipe as mp # For hand landmark recognition and locating
-import time # To slow down the gesture reconition for the related Tetris game
+import time # To time the frames and the held gestures
+
+import latency # To time every stage of a command when TETRAI_LATENCY=1
+from capture import IDLE_AFTER, IDLE_FPS, AdaptiveRate, CaptureThread, LatestSlot, PipelineStats, WorkerThread # To run the camera, the model and the window on separate threads
+from gestures import GESTURES, GestureDebouncer, confidences, landmarks_array # To compare the landmarks with the rules of every gesture
+from gesture_bench import SessionRecorder # To record the landmarks for offline testing
+from transport import open_sender # To send the gestures to the Tetris game
 
 # Initialize MediaPipe Hands and Drawing utilities
 mp_hands = mp.solutions.hands
 mp_drawing = mp.solutions.drawing_utils
 
 valid_commands = ['up', 'down', 'left', 'right', 'closedfist', 'openpalm']
-file_path='command.txt'
-
-# Function to recognize gestures based on landmarks
-def recognize_gesture(landmarks):
-    command_gesture = None
-
-    if landmarks:
-        # Get the x and y coordinates of all landmarks
-        WRIST_X = landmarks[0].x
-        WRIST_Y = landmarks[0].y
-        THUMB_CMC_X = landmarks[1].x
-        THUMB_CMC_Y = landmarks[1].y
-        THUMB_MCP_X = landmarks[2].x
-        THUMB_MCP_Y = landmarks[2].y
-        THUMB_IP_X = landmarks[3].x
-        THUMB_IP_Y = landmarks[3].y
-        THUMB_TIP_X = landmarks[4].x
-        THUMB_TIP_Y = landmarks[4].y
-        INDEX_FINGER_MCP_X = landmarks[5].x
-        INDEX_FINGER_MCP_Y = landmarks[5].y
-        INDEX_FINGER_PIP_X = landmarks[6].x
-        INDEX_FINGER_PIP_Y = landmarks[6].y
-        INDEX_FINGER_DIP_X = landmarks[7].x
-        INDEX_FINGER_DIP_Y = landmarks[7].y
-        INDEX_FINGER_TIP_X = landmarks[8].x
-        INDEX_FINGER_TIP_Y = landmarks[8].y
-        MIDDLE_FINGER_MCP_X = landmarks[9].x
-        MIDDLE_FINGER_MCP_Y = landmarks[9].y
-        MIDDLE_FINGER_PIP_X = landmarks[10].x
-        MIDDLE_FINGER_PIP_Y = landmarks[10].y
-        MIDDLE_FINGER_DIP_X = landmarks[11].x
-        MIDDLE_FINGER_DIP_Y = landmarks[11].y
-        MIDDLE_FINGER_TIP_X = landmarks[12].x
-        MIDDLE_FINGER_TIP_Y = landmarks[12].y
-        RING_FINGER_MCP_X = landmarks[13].x
-        RING_FINGER_MCP_Y = landmarks[13].y
-        RING_FINGER_PIP_X = landmarks[14].x
-        RING_FINGER_PIP_Y = landmarks[14].y
-        RING_FINGER_DIP_X = landmarks[15].x
-        RING_FINGER_DIP_Y = landmarks[15].y
-        RING_FINGER_TIP_X = landmarks[16].x
-        RING_FINGER_TIP_Y = landmarks[16].y
-        PINKY_MCP_X = landmarks[17].x
-        PINKY_MCP_Y = landmarks[17].y
-        PINKY_PIP_X = landmarks[18].x
-        PINKY_PIP_Y = landmarks[18].y
-        PINKY_DIP_X = landmarks[19].x
-        PINKY_DIP_Y = landmarks[19].y
-        PINKY_TIP_X = landmarks[20].x
-        PINKY_TIP_Y = landmarks[20].y
-
-
-
-        # Making the comparisons
-        # Hand is pointing left
-        if (INDEX_FINGER_TIP_X > INDEX_FINGER_MCP_X > WRIST_X
-                and INDEX_FINGER_PIP_X > MIDDLE_FINGER_TIP_X
-                and INDEX_FINGER_PIP_X > RING_FINGER_TIP_X
-                and INDEX_FINGER_PIP_X > PINKY_TIP_X
-                and INDEX_FINGER_MCP_Y < MIDDLE_FINGER_MCP_Y
-                and INDEX_FINGER_MCP_Y < RING_FINGER_MCP_Y
-                and INDEX_FINGER_MCP_Y < PINKY_MCP_Y
-                and WRIST_Y < PINKY_MCP_Y
-                and THUMB_TIP_Y > INDEX_FINGER_MCP_Y
-                and WRIST_Y > INDEX_FINGER_TIP_Y):
-            command_gesture = "left"
-
-        # Hand is pointing right
-        elif (WRIST_X > THUMB_CMC_X > THUMB_MCP_X > THUMB_IP_X > THUMB_TIP_X
-                and PINKY_MCP_X > INDEX_FINGER_MCP_X > THUMB_IP_X
-
-                and WRIST_Y > INDEX_FINGER_MCP_Y
-                and WRIST_Y > MIDDLE_FINGER_MCP_Y
-                and WRIST_Y > RING_FINGER_MCP_Y
-                and WRIST_Y > PINKY_MCP_Y
-                and INDEX_FINGER_TIP_Y > INDEX_FINGER_MCP_Y
-                and MIDDLE_FINGER_TIP_Y > MIDDLE_FINGER_MCP_Y
-                and RING_FINGER_TIP_Y > RING_FINGER_MCP_Y
-                and PINKY_TIP_Y > PINKY_MCP_Y):
-            command_gesture = "right"
-
-        # Hand is pointing up
-        elif (INDEX_FINGER_PIP_X > INDEX_FINGER_TIP_X
-              and MIDDLE_FINGER_PIP_X > MIDDLE_FINGER_TIP_X
-              and RING_FINGER_PIP_X > RING_FINGER_TIP_X
-              and PINKY_PIP_X > PINKY_TIP_X > WRIST_X
-              and  (THUMB_TIP_Y < THUMB_IP_Y < THUMB_MCP_Y < THUMB_CMC_Y  < WRIST_Y  <PINKY_TIP_Y)):
-            command_gesture = "up"
-
-        # Hand is pointing down
-        elif (INDEX_FINGER_PIP_X > INDEX_FINGER_TIP_X
-              and MIDDLE_FINGER_PIP_X > MIDDLE_FINGER_TIP_X
-              and RING_FINGER_PIP_X > RING_FINGER_TIP_X
-              and PINKY_PIP_X > PINKY_TIP_X > WRIST_X
-              and  (THUMB_TIP_Y > THUMB_IP_Y > THUMB_MCP_Y > THUMB_CMC_Y  > WRIST_Y  > PINKY_TIP_Y)):
-            command_gesture = "down"
-
-        # Hand is a closed fist
-        elif (WRIST_Y > THUMB_MCP_Y
-              and WRIST_Y > INDEX_FINGER_MCP_Y
-              and WRIST_Y > MIDDLE_FINGER_MCP_Y
-              and WRIST_Y > RING_FINGER_MCP_Y
-              and WRIST_Y > PINKY_MCP_Y
-              and THUMB_MCP_Y > INDEX_FINGER_MCP_Y
-              and THUMB_MCP_Y > MIDDLE_FINGER_MCP_Y
-              and THUMB_MCP_Y > RING_FINGER_MCP_Y
-              and THUMB_MCP_Y > PINKY_MCP_Y
-
-             and PINKY_MCP_X > RING_FINGER_MCP_X > MIDDLE_FINGER_MCP_X > INDEX_FINGER_MCP_X
-             and THUMB_TIP_X > THUMB_IP_X
-             and PINKY_MCP_X > THUMB_CMC_X):
-            command_gesture = "closedfist"
-
-        # Hand is an open palm
-        elif (PINKY_TIP_Y < PINKY_DIP_Y < PINKY_PIP_Y < PINKY_MCP_Y
-              and RING_FINGER_TIP_Y < RING_FINGER_DIP_Y < RING_FINGER_PIP_Y < RING_FINGER_MCP_Y
-              and MIDDLE_FINGER_TIP_Y < MIDDLE_FINGER_DIP_Y < MIDDLE_FINGER_PIP_Y < MIDDLE_FINGER_MCP_Y
-              and INDEX_FINGER_TIP_Y < INDEX_FINGER_DIP_Y < INDEX_FINGER_PIP_Y < INDEX_FINGER_MCP_Y
-              and THUMB_TIP_Y < THUMB_IP_Y < THUMB_MCP_Y < THUMB_CMC_Y < WRIST_Y):
-            command_gesture = "openpalm"
-        else:
-            command_gesture =  "Unidentified"
-
-    return command_gesture
-
-
-# Controlling output rate
-last_output_time = 0
-output_interval = 0.5  # seconds
-
-# Most of the code after this line is from the documentation
-# Initialize camera
-cap = cv2.VideoCapture(1)
-
-with mp_hands.Hands(
-        static_image_mode=False,
-        max_num_hands=1,
-        min_detection_confidence=0.7,
-        min_tracking_confidence=0.5
-) as hands:
-    while cap.isOpened():
+
+# Frame width given to the model with --adaptive, and seconds between two --stats lines
+ADAPTIVE_WIDTH = 320
+STATS_INTERVAL = 5.0
+
+def main():
+    parser = argparse.ArgumentParser(description='control the Tetris game with hand gestures')
+    parser.add_argument('--camera', type=int, default=1, help='index of the camera (default: 1)')
+    parser.add_argument('--no-display', action='store_true', help='do not show the camera window')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='downsample the frames and slow down while no hand is seen (for slow machines)')
+    parser.add_argument('--inference-width', type=int, default=None,
+                        help='width the frames are scaled down to before the model (default: 320 with --adaptive)')
+    parser.add_argument('--idle-after', type=float, default=IDLE_AFTER,
+                        help='seconds without a hand before slowing down (with --adaptive)')
+    parser.add_argument('--idle-fps', type=float, default=IDLE_FPS,
+                        help='frames per second processed while slowed down (with --adaptive)')
+    parser.add_argument('--stats', action='store_true', help='print the frame rates and CPU per frame every few seconds')
+    parser.add_argument('--record', default=None,
+                        help='save the landmarks of every frame to this .npz file (for gesture_bench.py)')
+    parser.add_argument('--label', default='', choices=('',) + GESTURES,
+                        help='gesture shown in the recording (keys 1-6 change it, 0 clears it)')
+    args = parser.parse_args()
+    inference_width = args.inference_width
+    if inference_width is None and args.adaptive:
+        inference_width = ADAPTIVE_WIDTH
+
+    commands = open_sender()
+    # Smooths the gestures over the frames instead of sending one every 0.5 seconds
+    debouncer = GestureDebouncer()
+    # Landmarks of every frame for gesture_bench.py
+    recorder = None
+    if args.record:
+        recorder = SessionRecorder()
+        recorder.label = args.label
+
+    # Most of the code after this line is from the documentation
+    # Initialize camera
+    cap = cv2.VideoCapture(args.camera)
+
+    # Capture thread: newest camera image, None stops the pipeline
+    def read_frame():
+        if not cap.isOpened():
+            return None
         ret, frame = cap.read()
         if not ret:
             print("Failed to capture frame")
-            break
-
-        # Convert BGR to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            return None
+        return frame
+
+    # Processing rate of the model, lowered while no hand is seen
+    rate = AdaptiveRate(args.idle_after, args.idle_fps) if args.adaptive else None
+
+    # Inference thread: hand landmarks and gesture of the newest frame
+    def process_frame(frame):
+        stamps = {'capture': frame.time} if latency.ENABLED else None
+
+        # Scale down (the landmarks are relative to the frame size) and convert BGR to RGB
+        image = frame.image
+        height, width = image.shape[:2]
+        if inference_width and width > inference_width:
+            image = cv2.resize(image, (inference_width, height * inference_width // width),
+                               interpolation=cv2.INTER_AREA)
+        rgb_frame = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         results = hands.process(rgb_frame)
+        if stamps is not None:
+            stamps['inference'] = time.time()
+        if rate is not None:
+            rate.update(bool(results.multi_hand_landmarks), frame.time)
 
-        # Draw hand landmarks and detect gestures
+        # Detect gestures, every frame goes through the debouncer (also frames without a hand)
+        scores = points = None
         if results.multi_hand_landmarks:
-            for hand_landmarks in results.multi_hand_landmarks:
-                mp_drawing.draw_landmarks(
-                    frame, hand_landmarks, mp_hands.HAND_CONNECTIONS
-                )
-
-                # Recognize gesture and control output rate
-                current_time = time.time()
-                if current_time - last_output_time >= output_interval:
-                    gesture = recognize_gesture(hand_landmarks.landmark)
-
-                    if gesture in valid_commands:
-                        with open(file_path, 'w') as file:
-                            file.write(gesture)
-                        print("Command", gesture, "is written in file")
+            points = landmarks_array(results.multi_hand_landmarks[0].landmark)
+            scores = confidences(points)
+        if recorder is not None:
+            recorder.add(frame.time, points)
+        gesture = debouncer.update(scores, frame.time)
+        if stamps is not None:
+            stamps['recognize'] = time.time()
+
+        if gesture in valid_commands:
+            if commands.send(gesture, stamps):
+                print("Command", gesture, "is sent")
+            else:
+                print("Command", gesture, "is not sent, the game is not running")
+
+        return frame, results.multi_hand_landmarks
+
+    frames = LatestSlot()
+    shown = None if args.no_display else LatestSlot()
+
+    with mp_hands.Hands(
+            static_image_mode=False,
+            max_num_hands=1,
+            min_detection_confidence=0.7,
+            min_tracking_confidence=0.5
+    ) as hands:
+        capture = CaptureThread(read_frame, frames)
+        inference = WorkerThread(process_frame, frames, shown, rate)
+        stats = PipelineStats(capture, inference)
+        last_stats = time.time()
+
+        def print_stats():
+            report = stats.report()
+            print("Camera %.1f fps, model %.1f fps%s, %.1f ms CPU per frame in the model thread,"
+                  " %.1f ms per frame in total (%.0f%% of one core)"
+                  % (report['capture_fps'], report['process_fps'], " (idle)" if rate and rate.idle() else "",
+                     report['cpu_ms_per_frame'], report['process_cpu_ms_per_frame'], report['process_cpu_percent']))
+
+        capture.start()
+        inference.start()
+        try:
+            if shown is None:
+                # No window, stop with Ctrl+C
+                while inference.is_alive():
+                    inference.join(0.5)
+                    if args.stats and time.time() - last_stats >= STATS_INTERVAL:
+                        last_stats = time.time()
+                        print_stats()
+            else:
+                # Display the newest processed frame, frames the window is too slow for are skipped
+                while True:
+                    result = shown.get(timeout=0.1)
+                    if result is None:
+                        if shown.closed:
+                            break
                     else:
-                        print("⚠️ invalid command")
-
-
-                    last_output_time = current_time
-
-        # Display the frame
-        cv2.imshow('Hand Gesture Recognition', frame)
-
-        # Break on 'q' key
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-# Release resources
-cap.release()
-cv2.destroyAllWindows()
+                        frame, multi_hand_landmarks = result
+                        # Draw hand landmarks
+                        for hand_landmarks in multi_hand_landmarks or []:
+                            mp_drawing.draw_landmarks(
+                                frame.image, hand_landmarks, mp_hands.HAND_CONNECTIONS
+                            )
+                        cv2.imshow('Hand Gesture Recognition', frame.image)
+
+                    if args.stats and time.time() - last_stats >= STATS_INTERVAL:
+                        last_stats = time.time()
+                        print_stats()
+
+                    # Break on 'q' key, number keys label the recording
+                    key = cv2.waitKey(1) & 0xFF
+                    if key == ord('q'):
+                        break
+                    if recorder is not None and ord('0') <= key <= ord('0') + len(GESTURES):
+                        recorder.label = GESTURES[key - ord('1')] if key != ord('0') else ''
+                        print("Recording label:", recorder.label or "none")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            capture.stop()
+            capture.join(1.0)
+            inference.join(1.0)
+
+    print("Captured %d frames, processed %d, dropped %d stale frames (%.1f ms per frame in the model)"
+          % (capture.captured, inference.processed, frames.dropped,
+             inference.busy / max(1, inference.processed) * 1000))
+
+    if recorder is not None:
+        recorder.save(args.record)
+        print("Saved", len(recorder), "frames to", args.record)
+
+    # Release resources
+    cap.release()
+    cv2.destroyAllWindows()
+    commands.close()
+
+
+if __name__ == '__main__':
+    main()
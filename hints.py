@@ -0,0 +1,89 @@
+"""
+hints.py
+This file runs the AI hint search on a worker thread so that pressing i or
+showing an open palm never blocks the game loop. The game sends a request
+tagged with a key (the number of the current block), keeps drawing and
+picks the answer up with poll() on a later frame (notify() is called when
+an answer is ready, so the game can sleep until then). Only the newest request
+is computed: a new request replaces one that has not started yet, and
+cancel() drops the pending request and throws away the answer of the one
+being computed, e.g. when the block has landed before the hint was ready.
+
+Authors: Yifan Qin, Kevin Abeykoon, Joanna Joy, Vivian Ma
+"""
+
+import threading
+import time
+
+from ai import ai_suggest_best_position
+
+
+class HintWorker:
+    """
+    computes AI hints on a background thread, newest request wins
+    """
+
+    def __init__(self, search=ai_suggest_best_position, notify=None):
+        self.search = search
+        self.notify = notify  # called on the worker thread when an answer is ready
+        self.condition = threading.Condition()
+        self.pending = None  # (generation, key, args) not started yet
+        self.result = None  # (key, value) not picked up yet
+        self.waiting = None  # key of the request that has no answer yet
+        self.generation = 0
+        self.last_duration = None  # seconds of the last search
+        self.thread = threading.Thread(target=self.run, name='hint-worker', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def request(self, key, *args):
+        """
+        ask for search(*args), replacing any request that has no answer yet
+        (the arguments must not be changed by the caller afterwards)
+        """
+        with self.condition:
+            self.generation += 1
+            self.pending = (self.generation, key, args)
+            self.waiting = key
+            self.condition.notify()
+
+    def cancel(self):
+        """
+        forget the request that has no answer yet
+        """
+        with self.condition:
+            self.generation += 1
+            self.pending = None
+            self.waiting = None
+
+    def poll(self):
+        """
+        (key, value) of a finished request, or None; never blocks on the search
+        """
+        if self.result is None:
+            return None
+        with self.condition:
+            result, self.result = self.result, None
+        return result
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None:
+                    self.condition.wait()
+                generation, key, args = self.pending
+                self.pending = None
+
+            started = time.perf_counter()
+            value = self.search(*args)
+            self.last_duration = time.perf_counter() - started
+
+            with self.condition:
+                # a newer request or a cancel() makes this answer useless
+                fresh = generation == self.generation
+                if fresh:
+                    self.result = (key, value)
+                    self.waiting = None
+            if fresh and self.notify is not None:
+                self.notify()
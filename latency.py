@@ -0,0 +1,103 @@
+"""
+latency.py
+This file measures how long a gesture takes to become a move on the screen.
+When TETRAI_LATENCY=1 is set for both programs, hand_gesture_recognition.py
+writes a timestamp for every stage of a command into the message (frame
+capture, hands.process, gesture classification, transport write) and the
+game adds its own (transport read, state update, pygame.display.update). The
+game keeps the time spent in every stage over the last commands and prints
+the p50 / p95 / p99 of each stage every few seconds, and also dumps them as
+JSON when TETRAI_LATENCY_FILE is set. When the variable is not set no
+timestamps are taken and messages are sent without them.
+
+Authors: Yifan Qin, Kevin Abeykoon, Joanna Joy, Vivian Ma
+"""
+
+import json
+import os
+import time
+from collections import deque
+
+ENABLED = os.environ.get('TETRAI_LATENCY', '') not in ('', '0')
+REPORT_FILE = os.environ.get('TETRAI_LATENCY_FILE')
+
+# stages in the order a command goes through them, every stage is timed
+# from the previous one
+STAGES = ('capture', 'inference', 'recognize', 'sent', 'received', 'applied', 'drawn')
+
+# number of commands kept for the percentiles
+WINDOW = 1000
+# seconds between two reports
+REPORT_INTERVAL = 5.0
+
+
+def percentile(sorted_values, fraction):
+    """
+    nearest-rank percentile of an already sorted list
+    """
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+class LatencyTracker:
+    """
+    rolling per-stage latency of the gesture commands
+    """
+
+    def __init__(self, window=WINDOW, report_interval=REPORT_INTERVAL, report_file=REPORT_FILE):
+        self.samples = {stage: deque(maxlen=window) for stage in STAGES[1:] + ('total',)}
+        self.report_interval = report_interval
+        self.report_file = report_file
+        self.last_report = time.time()
+        self.recorded = 0
+
+    def record(self, stamps):
+        """
+        add the stage timestamps of one command
+        """
+        previous = None
+        for stage in STAGES:
+            if stage in stamps:
+                if previous is not None:
+                    self.samples[stage].append(stamps[stage] - stamps[previous])
+                previous = stage
+        first = next((stage for stage in STAGES if stage in stamps), None)
+        if first is not None and previous != first:
+            self.samples['total'].append(stamps[previous] - stamps[first])
+        self.recorded += 1
+
+    def summary(self):
+        """
+        {stage: {'count', 'p50', 'p95', 'p99'}} in milliseconds
+        """
+        summary = {}
+        for stage, values in self.samples.items():
+            if values:
+                ordered = sorted(values)
+                summary[stage] = {'count': len(ordered),
+                                  'p50': percentile(ordered, 0.50) * 1000,
+                                  'p95': percentile(ordered, 0.95) * 1000,
+                                  'p99': percentile(ordered, 0.99) * 1000}
+        return summary
+
+    def report(self):
+        summary = self.summary()
+        if not summary:
+            return
+        print('gesture latency over the last %d commands (ms):' % max(stats['count'] for stats in summary.values()))
+        print('  %-10s %8s %8s %8s' % ('stage', 'p50', 'p95', 'p99'))
+        for stage, stats in summary.items():
+            print('  %-10s %8.1f %8.1f %8.1f' % (stage, stats['p50'], stats['p95'], stats['p99']))
+        if self.report_file:
+            with open(self.report_file, 'w') as file:
+                json.dump({'time': time.time(), 'stages': summary}, file, indent=2)
+
+    def maybe_report(self):
+        """
+        report when the report interval has passed and there is something new
+        """
+        now = time.time()
+        if self.recorded and now - self.last_report >= self.report_interval:
+            self.last_report = now
+            self.recorded = 0
+            self.report()
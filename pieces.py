@@ -0,0 +1,92 @@
+"""
+pieces.py
+This file turns the block drawings in blocks.py into a lookup table that is
+built once when the game starts. Every (piece, rotation) pair gets a small
+integer id, and its entry holds everything the game needs about that shape:
+the occupied cells, one bitmask per occupied row, the lowest and highest cell
+of every column, its width and the id of the next rotation. Rotating,
+checking collisions and drawing a block are then simple table lookups.
+
+Authors: Yifan Qin, Kevin Abeykoon, Joanna Joy, Vivian Ma
+"""
+
+from collections import namedtuple
+
+from blocks import block_000, block_001, block_002, block_003, block_004, block_005, block_006
+
+BLOCK_STYLE_LIST = [block_000, block_001, block_002, block_003, block_004, block_005, block_006]
+
+# id: index in SHAPES
+# piece / rotation: index of the block list in BLOCK_STYLE_LIST and of the drawing in that list
+# color: block letter ('A' .. 'G')
+# grid: the original drawing from blocks.py
+# cells: (row, col) offsets of the occupied cells inside the drawing
+# min_col / max_col: left-most and right-most occupied column of the drawing
+# row_masks: (row, mask) for every occupied row, bit 0 of mask is min_col
+# bottom / top: lowest and highest occupied row for each column min_col .. max_col
+# width: number of occupied columns
+# next_id: id of the shape after one rotation
+Shape = namedtuple('Shape', ['id', 'piece', 'rotation', 'color', 'grid', 'cells', 'min_col', 'max_col',
+                             'row_masks', 'bottom', 'top', 'width', 'next_id'])
+
+
+def build_shape_table(block_style_list):
+    """
+    build the shape table from the block lists
+    """
+    shapes = []
+    first_ids = []
+    for piece, block_list in enumerate(block_style_list):
+        first_id = len(shapes)
+        first_ids.append(first_id)
+        for rotation, grid in enumerate(block_list):
+            cells = tuple((row, col) for row, line in enumerate(grid)
+                          for col, block in enumerate(line) if block != '.')
+            color = grid[cells[0][0]][cells[0][1]]
+            min_col = min(col for _, col in cells)
+            max_col = max(col for _, col in cells)
+
+            row_masks = []
+            for row, line in enumerate(grid):
+                mask = 0
+                for col, block in enumerate(line):
+                    if block != '.':
+                        mask |= 1 << (col - min_col)
+                if mask:
+                    row_masks.append((row, mask))
+
+            bottom = tuple(max(row for row, c in cells if c == col) for col in range(min_col, max_col + 1))
+            top = tuple(min(row for row, c in cells if c == col) for col in range(min_col, max_col + 1))
+            next_id = first_id + (rotation + 1) % len(block_list)
+
+            shapes.append(Shape(len(shapes), piece, rotation, color, grid, cells, min_col, max_col,
+                                tuple(row_masks), bottom, top, max_col - min_col + 1, next_id))
+
+    return shapes, first_ids
+
+
+SHAPES, PIECE_FIRST_IDS = build_shape_table(BLOCK_STYLE_LIST)
+
+# drawing (as a tuple of strings) -> shape, for code that still holds block lists
+SHAPE_BY_GRID = {tuple(shape.grid): shape for shape in SHAPES}
+
+
+def shape_of(current_block):
+    """
+    table entry of a block drawing from blocks.py
+    """
+    return SHAPE_BY_GRID[tuple(current_block)]
+
+
+def rotate(shape):
+    """
+    the shape after one rotation
+    """
+    return SHAPES[shape.next_id]
+
+
+def rotation_count(shape):
+    """
+    number of distinct rotations of the piece
+    """
+    return len(BLOCK_STYLE_LIST[shape.piece])
@@ -0,0 +1,145 @@
+"""
+profiler.py
+This file measures where the time of every frame of the game loop goes.
+The loop calls start_frame() at the top and mark(section) after each part
+of the frame (waiting for events, the key presses, the gesture commands,
+the AI hint, gravity, drawing and pygame.display.update), so every section
+is timed from the previous mark with a single perf_counter() call. The
+times of the last frames are kept in rolling windows, from which the game
+window shows the frame rate, the busy time of a frame, the mean / p95 / max
+of every section and a histogram of the frame times (F3 in tetris.py).
+
+On request the next frames are also run under cProfile and the statistics
+are written to a .prof file, to see which functions the time went to
+(F4 in tetris.py). Taking the marks costs about a microsecond per frame, so
+the profiler is always on and the overlay shows the last frames as soon as
+it is opened.
+
+Authors: Yifan Qin, Kevin Abeykoon, Joanna Joy, Vivian Ma
+
+Notes:
+TETRAI_PROFILE_FRAMES=600 to profile more frames per capture,
+TETRAI_PROFILE_DIR=folder to write the captures somewhere else.
+>>> python3 -m pstats profiles/tetrai-20240101-120000.prof (then: sort cumtime, stats 20)
+"""
+
+import cProfile
+import os
+import time
+from collections import deque
+
+from latency import percentile
+
+# the parts of a frame in the order the loop goes through them; 'wait' is
+# the time the loop sleeps until the next event and is not part of the busy time
+SECTIONS = ('wait', 'input', 'commands', 'hint', 'gravity', 'draw', 'update', 'other')
+
+# number of frames kept for the statistics
+WINDOW = 240
+# upper bounds (milliseconds) of the frame time histogram buckets, the last one is open
+HISTOGRAM_BOUNDS = (1, 2, 4, 8, 16, 33)
+
+CAPTURE_FRAMES = int(os.environ.get('TETRAI_PROFILE_FRAMES', '300'))
+CAPTURE_DIR = os.environ.get('TETRAI_PROFILE_DIR',
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles'))
+
+
+def histogram(values, bounds=HISTOGRAM_BOUNDS):
+    """
+    counts of the values in each bucket: <= bounds[0], ..., > bounds[-1]
+    """
+    counts = [0] * (len(bounds) + 1)
+    for value in values:
+        index = 0
+        while index < len(bounds) and value > bounds[index]:
+            index += 1
+        counts[index] += 1
+    return counts
+
+
+class FrameProfiler:
+    """
+    rolling per-section time of the frames of the game loop, and cProfile
+    captures of the next frames on request
+    """
+
+    def __init__(self, window=WINDOW, capture_dir=CAPTURE_DIR):
+        self.samples = {section: deque(maxlen=window) for section in SECTIONS}
+        self.busy = deque(maxlen=window)  # milliseconds of each frame without the wait
+        self.starts = deque(maxlen=window)  # perf_counter() at the start of each frame
+        self.current = {}
+        self.last_mark = None
+        self.capture_dir = capture_dir
+        self.profile = None
+        self.capture_left = 0
+
+    def start_frame(self):
+        self.last_mark = time.perf_counter()
+        self.starts.append(self.last_mark)
+        self.current = dict.fromkeys(SECTIONS, 0.0)
+        if self.capture_left and self.profile is None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def mark(self, section):
+        """
+        the time since the previous mark was spent in section
+        """
+        now = time.perf_counter()
+        self.current[section] += (now - self.last_mark) * 1000
+        self.last_mark = now
+
+    def end_frame(self):
+        """
+        store the times of the frame, returns the path of a finished capture or None
+        """
+        self.mark('other')
+        for section, milliseconds in self.current.items():
+            self.samples[section].append(milliseconds)
+        self.busy.append(sum(self.current.values()) - self.current['wait'])
+
+        if self.profile is not None:
+            self.capture_left -= 1
+            if not self.capture_left:
+                return self.save_capture()
+        return None
+
+    def capture(self, frames=CAPTURE_FRAMES):
+        """
+        run the next frames under cProfile, returns False (and does nothing)
+        while a capture is running
+        """
+        if self.capture_left:
+            return False
+        self.capture_left = max(1, frames)
+        return True
+
+    def save_capture(self):
+        self.profile.disable()
+        os.makedirs(self.capture_dir, exist_ok=True)
+        path = os.path.join(self.capture_dir, 'tetrai-%s.prof' % time.strftime('%Y%m%d-%H%M%S'))
+        self.profile.dump_stats(path)
+        self.profile = None
+        return path
+
+    def fps(self):
+        """
+        frames per second over the window (the loop only runs when something happens)
+        """
+        if len(self.starts) < 2:
+            return 0.0
+        return (len(self.starts) - 1) / max(self.starts[-1] - self.starts[0], 1e-9)
+
+    def summary(self):
+        """
+        {section: (mean, p95, max)} in milliseconds, with 'busy' for the whole frame
+        """
+        result = {}
+        for name, values in list(self.samples.items()) + [('busy', self.busy)]:
+            if values:
+                ordered = sorted(values)
+                result[name] = (sum(ordered) / len(ordered), percentile(ordered, 0.95), ordered[-1])
+        return result
+
+    def frame_histogram(self):
+        return histogram(self.busy)
@@ -0,0 +1,306 @@
+"""
+render.py
+This file draws the Tetris game window. Everything that never changes (the
+background colour, the grid lines, the border, the logo and the panel
+labels) is drawn once to a background surface. Each frame only the board
+cells whose colour changed, the panel texts whose value changed and the
+next-block preview (when the next block changed) are drawn again, and only
+their rectangles are passed to pygame.display.update. A frame where nothing
+changed draws nothing, so between two gravity ticks the game is almost
+idle. The cells are pre-rendered sprites, one per block colour, and all
+the cells of a frame are drawn with a single Surface.blits call. Images
+and texts come from the asset cache (assets.py), so a text is only
+rendered again when its value changes. The picture is the same as the one
+of the original full redraw.
+
+Authors: Yifan Qin, Kevin Abeykoon, Joanna Joy, Vivian Ma
+"""
+
+import pygame
+
+from assets import LOGO_FILE
+from board import BLOCK_COL_NUM, BLOCK_ROW_NUM, EMPTY
+from profiler import HISTOGRAM_BOUNDS, SECTIONS
+
+SCREEN_WIDTH, SCREEN_HEIGHT = 450, 750
+BG_COLOR = (40, 40, 60)
+SIZE = 30
+BORDER_WIDTH = 4
+RED = (200, 30, 30)
+TEXT_COLOR = (150, 130, 200)
+PAUSE_COLOR = (255, 255, 0)
+GRID_COLOR = (0, 0, 0)
+FONT_SIZE = 20
+SMALL_FONT_SIZE = 13
+COLOR_DICT = {'A': (20, 128, 200), 'B': (134, 20, 200), 'C': (20, 200, 185), 'D': (200, 197, 20), 'E': (200, 20, 23), 'F': (200, 20, 188), 'G': (255, 126, 2)}
+
+PANEL_X = BLOCK_COL_NUM * SIZE + 10
+# next block preview: 4 x 4 cells with their outlines
+PREVIEW_X, PREVIEW_Y = 320, BLOCK_COL_NUM * SIZE + 140
+PREVIEW_RECT = pygame.Rect(PREVIEW_X, PREVIEW_Y, 4 * SIZE + 1, 4 * SIZE + 1)
+
+# frame profiler overlay (F3), over the top of the board
+PROFILE_RECT = pygame.Rect(4, 4, BLOCK_COL_NUM * SIZE - 18, 214)
+PROFILE_FONT_SIZE = 8
+PROFILE_LINE = 12
+PROFILE_BG = (0, 0, 0)
+PROFILE_ALPHA = 210
+PROFILE_COLOR = (230, 230, 230)
+PROFILE_BAR_COLOR = (100, 200, 120)
+
+
+def make_tiles():
+    """
+    sprite of a board cell (grid lines on the top and left, like the grid
+    drawn over the blocks) and of a preview cell (outlined on every side)
+    for every block letter
+    """
+    board_tiles, preview_tiles = {}, {}
+    for letter, color in COLOR_DICT.items():
+        tile = pygame.Surface((SIZE, SIZE)).convert()
+        tile.fill(color)
+        pygame.draw.line(tile, GRID_COLOR, (0, 0), (0, SIZE - 1), 1)
+        pygame.draw.line(tile, GRID_COLOR, (0, 0), (SIZE - 1, 0), 1)
+        board_tiles[ord(letter)] = tile
+
+        tile = pygame.Surface((SIZE + 1, SIZE + 1)).convert()
+        tile.fill(color)
+        pygame.draw.rect(tile, GRID_COLOR, tile.get_rect(), 1)
+        preview_tiles[letter] = tile
+    return board_tiles, preview_tiles
+
+
+def draw_background(screen, assets):
+    """
+    the parts of the window that never change
+    """
+    background = pygame.Surface(screen.get_size()).convert()
+    background.fill(BG_COLOR)
+
+    # separate the game board and the information board
+    pygame.draw.line(background, (100, 40, 200), (SIZE * BLOCK_COL_NUM, 0), (SIZE * BLOCK_COL_NUM, SCREEN_HEIGHT),
+                     BORDER_WIDTH)
+    # Display Vertical Grid Lines
+    for x in range(BLOCK_COL_NUM):
+        pygame.draw.line(background, GRID_COLOR, (x * SIZE, 0), (x * SIZE, SCREEN_HEIGHT), 1)
+    # Display horizontal Grid Lines
+    for y in range(BLOCK_ROW_NUM):
+        pygame.draw.line(background, GRID_COLOR, (0, y * SIZE), (BLOCK_COL_NUM * SIZE, y * SIZE), 1)
+
+    # logo
+    background.blit(assets.image(LOGO_FILE, (143, 80)), (306, 3))
+
+    # labels of the information board
+    for text, y in (('Score: ', 160), ('Speed: ', 250), ('Next', 350), ('Block: ', 390)):
+        background.blit(assets.text(text, text, FONT_SIZE, TEXT_COLOR), (PANEL_X, y))
+    return background
+
+
+class Renderer:
+    """
+    draws the game on the screen, redrawing only what changed since the last frame
+    """
+
+    def __init__(self, screen, assets):
+        self.screen = screen
+        self.assets = assets
+        self.background = draw_background(screen, assets)
+        self.board_tiles, self.preview_tiles = make_tiles()
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        redraw the whole window on the next frame
+        """
+        self.full = True
+        self.cells = bytearray([EMPTY]) * (BLOCK_ROW_NUM * BLOCK_COL_NUM)
+        self.texts = {}  # key: (text, rect on the screen)
+        self.next_id = None
+        self.overlay = (False, False)  # (paused, game over)
+
+    def forget(self, rect):
+        """
+        draw the board cells under rect again on the next frame (e.g. after
+        something else was drawn over them)
+        """
+        for row in range(max(0, rect.top // SIZE), min(BLOCK_ROW_NUM, (rect.bottom - 1) // SIZE + 1)):
+            for col in range(max(0, rect.left // SIZE), min(BLOCK_COL_NUM, (rect.right - 1) // SIZE + 1)):
+                # no cell has this value, so the cell counts as changed
+                self.cells[row * BLOCK_COL_NUM + col] = 0
+
+    def draw(self, game, hint=None, paused=False):
+        """
+        draw one frame; hint is (title, turns, columns, slide) or None.
+        returns the rectangles that changed (to pass to pygame.display.update)
+        """
+        overlay = (paused, game.game_over)
+        if overlay != self.overlay:
+            # the pause / game over texts cover the board and the panel
+            self.invalidate()
+            self.overlay = overlay
+        if self.full:
+            self.screen.blit(self.background, (0, 0))
+
+        dirty = []
+        # the board, the falling block and the preview are drawn with one blits call
+        sprites = []
+        self.draw_cells(game, sprites, dirty)
+        self.draw_next_block(game.next_block, sprites, dirty)
+        if sprites:
+            self.screen.blits(sprites, doreturn=False)
+        self.draw_text('score', str(game.score), FONT_SIZE, (PANEL_X, 200), dirty)
+        self.draw_text('speed', game.speed_info, FONT_SIZE, (PANEL_X, 290), dirty)
+
+        # AI Hint
+        title, turns, columns, slide = hint if hint is not None else (None, None, None, False)
+        self.draw_text('hint_title', title, SMALL_FONT_SIZE, (PANEL_X, 590), dirty)
+        self.draw_text('hint_turn_label', hint and 'Turn:', SMALL_FONT_SIZE, (PANEL_X, 615), dirty)
+        self.draw_text('hint_turn', hint and str(turns), SMALL_FONT_SIZE, (PANEL_X, 640), dirty)
+        self.draw_text('hint_column_label', hint and 'Column:', SMALL_FONT_SIZE, (PANEL_X, 665), dirty)
+        self.draw_text('hint_column', hint and str(columns), SMALL_FONT_SIZE, (PANEL_X, 690), dirty)
+        # a straight drop in these columns lands on an overhang, the block has to be moved under it
+        self.draw_text('hint_slide', 'Slide in' if hint and slide else None, SMALL_FONT_SIZE, (PANEL_X, 715), dirty)
+
+        if any(self.overlay):
+            if dirty and not self.full:
+                # the texts are blended over what is below them, draw everything again under them
+                self.invalidate()
+                self.overlay = overlay
+                return self.draw(game, hint, paused)
+            if self.full:
+                self.draw_overlay()
+
+        if self.full:
+            self.full = False
+            return [self.screen.get_rect()]
+        return dirty
+
+    def draw_cells(self, game, sprites, dirty):
+        # the board cells cover the current block
+        cells = bytearray(game.board.colors)
+        block = game.current_block
+        for row, col in block.cells:
+            row += game.row
+            col += game.col
+            if 0 <= row < BLOCK_ROW_NUM and cells[row * BLOCK_COL_NUM + col] == EMPTY:
+                cells[row * BLOCK_COL_NUM + col] = ord(block.color)
+
+        if cells == self.cells and not self.full:
+            return
+        # after a full redraw the background is already there under the empty cells
+        previous = bytearray([EMPTY]) * len(cells) if self.full else self.cells
+        background, tiles = self.background, self.board_tiles
+        for index, letter in enumerate(cells):
+            if letter == previous[index] and not (self.full and letter != EMPTY):
+                continue
+            row, col = divmod(index, BLOCK_COL_NUM)
+            rect = pygame.Rect(col * SIZE, row * SIZE, SIZE, SIZE)
+            if letter == EMPTY:
+                sprites.append((background, rect, rect))
+            else:
+                sprites.append((tiles[letter], rect))
+            dirty.append(rect)
+        self.cells = cells
+
+    def draw_text(self, key, text, size, position, dirty):
+        """
+        draw a panel text (None to remove it) when it differs from the last frame
+        """
+        old_text, old_rect = self.texts.get(key, (None, None))
+        if text == old_text and not self.full:
+            return
+        if old_rect is not None:
+            self.screen.blit(self.background, old_rect, old_rect)
+            dirty.append(old_rect)
+        rect = None
+        if text is not None:
+            rect = self.screen.blit(self.assets.text(key, text, size, TEXT_COLOR), position)
+            dirty.append(rect)
+        self.texts[key] = (text, rect)
+
+    def draw_next_block(self, next_block, sprites, dirty):
+        if next_block.id == self.next_id and not self.full:
+            return
+        self.next_id = next_block.id
+        sprites.append((self.background, PREVIEW_RECT, PREVIEW_RECT))
+        tile = self.preview_tiles[next_block.color]
+        for row, col in next_block.cells:
+            sprites.append((tile, (PREVIEW_X + SIZE * col, PREVIEW_Y + SIZE * row)))
+        dirty.append(PREVIEW_RECT)
+
+    def draw_overlay(self):
+        """
+        pause or game over texts over the middle of the window
+        """
+        paused, game_over = self.overlay
+        if paused:
+            pause_msg = self.assets.text('PAUSED', 'PAUSED', FONT_SIZE, PAUSE_COLOR)
+            self.screen.blit(pause_msg, ((SCREEN_WIDTH - pause_msg.get_width()) // 2, SCREEN_HEIGHT // 2))
+            resume_msg = self.assets.text('Press P to Resume', 'Press P to Resume', FONT_SIZE, PAUSE_COLOR)
+            self.screen.blit(resume_msg, ((SCREEN_WIDTH - resume_msg.get_width()) // 2, SCREEN_HEIGHT // 2 + 40))
+        if game_over:
+            game_over_tips = self.assets.text('GAME OVER', 'GAME OVER', FONT_SIZE, RED)
+            self.screen.blit(game_over_tips, ((SCREEN_WIDTH - game_over_tips.get_width()) // 2,
+                                              (SCREEN_HEIGHT - game_over_tips.get_height()) // 2))
+            game_again = self.assets.text('NEW GAME', 'NEW GAME', FONT_SIZE, RED)
+            self.screen.blit(game_again, ((SCREEN_WIDTH - game_again.get_width()) // 2,
+                                          (SCREEN_HEIGHT - game_again.get_height()) // 2 + 80))
+
+
+class ProfileOverlay:
+    """
+    frame rate, time per section of the game loop and a histogram of the
+    frame times (profiler.FrameProfiler), drawn over the board
+    """
+
+    def __init__(self, screen, assets):
+        self.screen = screen
+        self.assets = assets
+        self.panel = pygame.Surface(PROFILE_RECT.size).convert()
+        self.panel.fill(PROFILE_BG)
+        self.panel.set_alpha(PROFILE_ALPHA)
+
+    def line(self, index, text):
+        surface = self.assets.text('profile_%d' % index, text, PROFILE_FONT_SIZE, PROFILE_COLOR)
+        self.screen.blit(surface, (PROFILE_RECT.x + 4, PROFILE_RECT.y + 4 + index * PROFILE_LINE))
+
+    def draw(self, profiler, hint_seconds=None):
+        """
+        draw the overlay on the screen (after the frame), returns its rectangle
+        """
+        self.screen.blit(self.panel, PROFILE_RECT)
+        summary = profiler.summary()
+        busy = summary.get('busy', (0.0, 0.0, 0.0))
+        self.line(0, '%5.1f FPS  frame %5.2f ms' % (profiler.fps(), busy[0]))
+        self.line(1, '%-8s%6s%6s%7s' % ('ms', 'mean', 'p95', 'max'))
+
+        # sections with a bar of their share of the busy time (the wait is not busy)
+        bar_x = PROFILE_RECT.x + 4 + self.assets.font(PROFILE_FONT_SIZE).size('x' * 27)[0] + 4
+        bar_width = PROFILE_RECT.right - 4 - bar_x
+        for index, name in enumerate(SECTIONS + ('busy',), 2):
+            mean, p95, maximum = summary.get(name, (0.0, 0.0, 0.0))
+            self.line(index, '%-8s%6.2f%6.2f%7.2f' % (name, mean, p95, maximum))
+            if name not in ('wait', 'busy') and busy[0] > 0:
+                width = round(bar_width * min(1.0, mean / busy[0]))
+                if width:
+                    pygame.draw.rect(self.screen, PROFILE_BAR_COLOR,
+                                     (bar_x, PROFILE_RECT.y + 5 + index * PROFILE_LINE, width, PROFILE_LINE - 4))
+        index = len(SECTIONS) + 3
+        self.line(index, 'ai search %s' % ('-' if hint_seconds is None else '%.2f ms' % (hint_seconds * 1000)))
+
+        # histogram of the busy time of the frames
+        counts = profiler.frame_histogram()
+        # the font has no < or >: up to 1 ms, up to 2 ms, ... and 33+ ms
+        labels = ['%d' % bound for bound in HISTOGRAM_BOUNDS] + ['%d+' % HISTOGRAM_BOUNDS[-1]]
+        top = PROFILE_RECT.y + 4 + (index + 1) * PROFILE_LINE
+        label_y = PROFILE_RECT.bottom - 4 - PROFILE_LINE
+        height = label_y - top - 2
+        column = (PROFILE_RECT.width - 8) // len(counts)
+        for bucket, (count, label) in enumerate(zip(counts, labels)):
+            x = PROFILE_RECT.x + 4 + bucket * column
+            bar = round(height * count / max(max(counts), 1))
+            if bar:
+                pygame.draw.rect(self.screen, PROFILE_BAR_COLOR, (x + 2, label_y - 2 - bar, column - 4, bar))
+            text = self.assets.text('profile_bucket_%d' % bucket, label, PROFILE_FONT_SIZE, PROFILE_COLOR)
+            self.screen.blit(text, (x + 2, label_y))
+        return PROFILE_RECT
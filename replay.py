@@ -0,0 +1,291 @@
+"""
+replay.py
+This file records games and plays them back. A game is stored as its seed
+and the list of actions applied to the engine (left, right, up = rotate,
+down = soft drop, tick = gravity, drop and hint), each with the time it
+happened, so a whole game takes a few kilobytes instead of a video. Every
+few hundred actions, and at the end of the game, a snapshot of the game
+state is stored as well; the blocks still to come are not stored, they are
+drawn again from the seed.
+To jump to any action the player restores the closest snapshot before it
+and only replays the actions after it. Playback goes through the same
+Engine.step as the game window, either headless as fast as possible (to
+reproduce bugs or collect statistics) or at real time in a window.
+
+Authors: Yifan Qin, Kevin Abeykoon, Joanna Joy, Vivian Ma
+
+Notes:
+tetris.py records every game to the replays folder next to this file
+(TETRAI_REPLAYS=folder to change it, TETRAI_REPLAYS= to turn it off).
+>>> python3 replay.py replays/game.replay (replay headless, print the result and check the snapshots)
+>>> python3 replay.py replays/game.replay --seek 500 (print the board after action 500)
+>>> python3 replay.py replays/game.replay --watch --from 500 --speed 2 (watch from action 500 at double speed)
+"""
+
+import argparse
+import bisect
+import gzip
+import json
+import os
+import random
+import time
+
+from board import BLOCK_COL_NUM, Board
+from engine import Engine, change_speed, get_block
+from pieces import SHAPES
+
+REPLAY_DIR = os.environ.get('TETRAI_REPLAYS', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'replays'))
+# actions between two snapshots
+SNAPSHOT_EVERY = 250
+VERSION = 1
+
+# actions of the log, 'hint' only shows the AI hint and does not change the game
+ACTION_CODES = {'left': 'L', 'right': 'R', 'up': 'U', 'down': 'D', 'tick': 'T', 'drop': 'X', 'hint': 'H'}
+CODE_ACTIONS = {code: action for action, code in ACTION_CODES.items()}
+
+
+def new_seed():
+    return random.randrange(2 ** 32)
+
+
+def snapshot(game, index):
+    """
+    state of the game after the first index actions (without the random generator)
+    """
+    return {'index': index, 'rows': list(game.board.rows), 'colors': game.board.colors.decode(),
+            'score': game.score, 'lines': game.lines, 'pieces': game.pieces, 'row': game.row, 'col': game.col,
+            'current': game.current_block.id, 'game_over': game.game_over}
+
+
+def restore(seed, state):
+    """
+    engine in the state of a snapshot; the blocks are drawn again from the
+    seed (one block when the game starts and one for every block played)
+    """
+    game = Engine(seed)
+    game.rng = random.Random(seed)
+    for _ in range(state['pieces'] + 1):
+        game.next_block = get_block(game.rng)
+    game.board = Board(list(state['rows']), bytearray(state['colors'].encode()))
+    game.score = state['score']
+    game.lines = state['lines']
+    game.pieces = state['pieces']
+    game.speed_info, game.speed = change_speed(game.score)
+    game.game_over = state['game_over']
+    game.current_block = SHAPES[state['current']]
+    game.row = state['row']
+    game.col = state['col']
+    return game
+
+
+class Recorder:
+    """
+    action log of one game, fed with the actions applied to the engine
+    """
+
+    def __init__(self, game, snapshot_every=SNAPSHOT_EVERY):
+        self.seed = game.seed
+        self.started = time.time()
+        self.snapshot_every = snapshot_every
+        self.actions = []
+        self.times = []  # milliseconds since the start
+        self.snapshots = [snapshot(game, 0)]
+        self.saved = False
+
+    def step(self, game, action):
+        """
+        apply the action to the game and record it, return whether the game changed
+        """
+        if game.game_over:
+            return False
+        changed = game.step(action) if action != 'hint' else False
+        self.actions.append(ACTION_CODES[action])
+        self.times.append(round((time.time() - self.started) * 1000))
+        if len(self.actions) % self.snapshot_every == 0:
+            self.snapshots.append(snapshot(game, len(self.actions)))
+        return changed
+
+    def save(self, game, folder=REPLAY_DIR):
+        """
+        write the replay file (once) with a last snapshot of the game, so the
+        end state is always checked, returns its path
+        """
+        if self.snapshots[-1]['index'] != len(self.actions):
+            self.snapshots.append(snapshot(game, len(self.actions)))
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, 'tetrai-%s-%d.replay' % (time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started)),
+                                                              self.seed))
+        save_replay(path, Replay(self.seed, self.started, ''.join(self.actions), self.times, self.snapshots))
+        self.saved = True
+        return path
+
+
+class Replay:
+    """
+    a recorded game: seed, actions (one code letter each), their times in
+    milliseconds and the snapshots
+    """
+
+    def __init__(self, seed, started, actions, times, snapshots):
+        self.seed = seed
+        self.started = started
+        self.actions = actions
+        self.times = times
+        self.snapshots = snapshots
+        self.snapshot_indexes = [state['index'] for state in snapshots]
+
+    def __len__(self):
+        return len(self.actions)
+
+    def action(self, index):
+        return CODE_ACTIONS[self.actions[index]]
+
+    def seek(self, index):
+        """
+        engine after the first index actions, from the closest snapshot
+        """
+        index = max(0, min(index, len(self.actions)))
+        state = self.snapshots[bisect.bisect_right(self.snapshot_indexes, index) - 1]
+        game = restore(self.seed, state)
+        self.fast_forward(game, state['index'], index)
+        return game
+
+    def fast_forward(self, game, start, stop=None):
+        """
+        apply the actions start..stop to the game without waiting
+        """
+        stop = len(self.actions) if stop is None else stop
+        for index in range(start, stop):
+            code = self.actions[index]
+            if code != 'H':
+                game.step(CODE_ACTIONS[code])
+        return game
+
+
+def save_replay(path, replay):
+    with gzip.open(path, 'wt') as file:
+        json.dump({'version': VERSION, 'seed': replay.seed, 'started': replay.started, 'actions': replay.actions,
+                   'times': replay.times, 'snapshots': replay.snapshots}, file, separators=(',', ':'))
+
+
+def load_replay(path):
+    with gzip.open(path, 'rt') as file:
+        data = json.load(file)
+    if data.get('version') != VERSION:
+        raise ValueError('unsupported replay version in %s: %r' % (path, data.get('version')))
+    return Replay(data['seed'], data['started'], data['actions'], data['times'], data['snapshots'])
+
+
+def check_snapshots(replay):
+    """
+    indexes of the snapshots that the replayed game does not reach (should be empty)
+    """
+    game = restore(replay.seed, replay.snapshots[0])
+    mismatches = []
+    done = 0
+    for state in replay.snapshots[1:]:
+        replay.fast_forward(game, done, state['index'])
+        done = state['index']
+        if snapshot(game, done) != state:
+            mismatches.append(done)
+    return mismatches
+
+
+def board_text(game):
+    """
+    the board as text, the current block in lower case
+    """
+    cells = [['.'] * BLOCK_COL_NUM for _ in game.board.rows]
+    for row, col, letter in game.board.cells():
+        cells[row][col] = letter
+    for row, col in game.current_block.cells:
+        if 0 <= game.row + row < len(cells):
+            cells[game.row + row][game.col + col] = game.current_block.color.lower()
+    return '\n'.join(''.join(row) for row in cells)
+
+
+def watch(replay, start, speed):
+    """
+    play the replay at real time (times speed) in a game window
+    """
+    import pygame
+
+    from ai import ai_suggest_best_position
+    from assets import Assets
+    from render import SCREEN_HEIGHT, SCREEN_WIDTH, Renderer
+
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption('Tretr.ai replay')
+    renderer = Renderer(screen, Assets())
+    game = replay.seek(start)
+    hint = None
+    pygame.display.update(renderer.draw(game))
+
+    # replay time in milliseconds = (wall time - offset) * speed
+    offset = time.time() - (replay.times[start - 1] if start else 0) / 1000 / speed
+    for index in range(start, len(replay)):
+        while (time.time() - offset) * speed * 1000 < replay.times[index]:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return
+            # the deadline can pass while the events are read
+            remaining = replay.times[index] / 1000 / speed - (time.time() - offset)
+            if remaining > 0:
+                time.sleep(min(0.01, remaining))
+
+        action = replay.action(index)
+        if action == 'hint':
+            best_col_list, best_rotation, _, slide = ai_suggest_best_position(game.current_block, game.board.copy(),
+                                                                              game.next_block)
+            hint = ('AI HINT:', best_rotation, best_col_list, slide), game.pieces
+        else:
+            game.step(action)
+        shown = hint[0] if hint is not None and hint[1] == game.pieces else None
+        rects = renderer.draw(game, shown)
+        if rects:
+            pygame.display.update(rects)
+
+    # keep the last frame until the window is closed
+    while pygame.event.wait().type != pygame.QUIT:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='play back a recorded Tetris game')
+    parser.add_argument('replay', help='.replay file written by tetris.py')
+    parser.add_argument('--seek', type=int, default=None, help='print the board after this many actions')
+    parser.add_argument('--watch', action='store_true', help='play the game in a window at real time')
+    parser.add_argument('--from', dest='start', type=int, default=0, help='action to start watching from')
+    parser.add_argument('--speed', type=float, default=1.0, help='playback speed when watching')
+    args = parser.parse_args()
+
+    replay = load_replay(args.replay)
+    if args.watch:
+        watch(replay, max(0, min(args.start, len(replay))), args.speed)
+        return
+
+    if args.seek is not None:
+        game = replay.seek(args.seek)
+        print('after %d of %d actions: score %d, lines %d, block %d' % (min(max(args.seek, 0), len(replay)),
+                                                                        len(replay), game.score, game.lines,
+                                                                        game.pieces))
+        print(board_text(game))
+        return
+
+    started = time.perf_counter()
+    game = replay.fast_forward(restore(replay.seed, replay.snapshots[0]), 0)
+    seconds = time.perf_counter() - started
+    print('seed %d, %d actions over %.1f s of play: score %d, lines %d, %d blocks%s'
+          % (replay.seed, len(replay), (replay.times[-1] if replay.times else 0) / 1000, game.score, game.lines,
+             game.pieces, ', game over' if game.game_over else ''))
+    print('replayed in %.3f s (%.0f actions/s)' % (seconds, len(replay) / max(seconds, 1e-9)))
+    mismatches = check_snapshots(replay)
+    if mismatches:
+        print('snapshots that do not match the replay: %s' % mismatches)
+    else:
+        print('all %d snapshots match' % len(replay.snapshots))
+
+
+if __name__ == '__main__':
+    main()
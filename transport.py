@@ -0,0 +1,284 @@
+"""
+transport.py
+This file carries the gesture commands from hand_gesture_recognition.py to
+the Tetris game. Every command is sent as a small JSON message with the id
+of the sending process, a sequence number and the time it was sent, so the
+game applies each command exactly once: repeated sequence numbers are
+ignored and gaps are counted as lost commands.
+
+Two backends are available:
+1. socket (default): a Unix domain datagram socket. A background thread in
+   the game waits for messages and puts them in a queue, so polling from the
+   game loop is a plain queue check without any system call while idle,
+   and the game can sleep until the thread tells it about a message.
+2. file: commands are appended as lines to command.txt and the game reads
+   the lines it has not seen yet. Nothing is truncated, so a command written
+   while the game is reading is picked up on the next poll. This is the
+   fallback for systems without Unix domain sockets.
+
+The backend is chosen with the TETRAI_TRANSPORT environment variable
+('socket' or 'file') and the socket path with TETRAI_SOCKET; both programs
+must use the same settings.
+
+Authors: Yifan Qin, Kevin Abeykoon, Joanna Joy, Vivian Ma
+"""
+
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import deque, namedtuple
+
+COMMAND_FILE = 'command.txt'
+SOCKET_PATH = os.environ.get('TETRAI_SOCKET', os.path.join(tempfile.gettempdir(), 'tetrai-commands.sock'))
+MAX_MESSAGE_SIZE = 4096
+
+# sender: id of the sending process, seq: sequence number of the sender,
+# sent: time.time() when it was sent, command: the gesture command,
+# stamps: stage timestamps for latency.py (None when latency is not measured)
+Message = namedtuple('Message', ['sender', 'seq', 'sent', 'command', 'stamps'], defaults=(None,))
+
+
+def default_kind():
+    kind = os.environ.get('TETRAI_TRANSPORT')
+    if kind:
+        return kind
+    return 'socket' if hasattr(socket, 'AF_UNIX') else 'file'
+
+
+def encode(message):
+    fields = message._asdict()
+    if fields['stamps'] is None:
+        del fields['stamps']
+    return json.dumps(fields).encode() + b'\n'
+
+
+def decode(data):
+    """
+    message from the raw bytes, None when they cannot be read
+    """
+    data = data.strip()
+    if not data:
+        return None
+    try:
+        fields = json.loads(data)
+        return Message(fields['sender'], fields['seq'], fields['sent'], fields['command'], fields.get('stamps'))
+    except (ValueError, KeyError, TypeError):
+        # a plain command written by an older gesture program
+        return Message(None, None, time.time(), data.decode(errors='replace'))
+
+
+class Receiver:
+    """
+    common part of the receivers: drops duplicates and counts lost messages.
+    poll_interval is how often poll() must be called to see new messages, or
+    None when the receiver calls notify() instead when a message arrives
+    """
+
+    poll_interval = None
+
+    def __init__(self, notify=None):
+        self.notify = notify
+        self.last_seq = {}
+        self.lost = 0
+        self.duplicates = 0
+
+    def accept(self, message):
+        """
+        whether the message is new (and should be applied)
+        """
+        if message.seq is None:
+            return True
+        last = self.last_seq.get(message.sender)
+        if last is not None:
+            if message.seq <= last:
+                self.duplicates += 1
+                return False
+            self.lost += message.seq - last - 1
+        self.last_seq[message.sender] = message.seq
+        return True
+
+    def poll(self):
+        """
+        list of the new messages, never blocks
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SocketReceiver(Receiver):
+    """
+    receives datagrams on a Unix domain socket in a background thread
+    """
+
+    def __init__(self, path=SOCKET_PATH, notify=None):
+        super().__init__(notify)
+        self.path = path
+        if os.path.exists(path):
+            os.unlink(path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(path)
+        self.queue = deque()
+        self.thread = threading.Thread(target=self.run, name='command-receiver', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                data = self.sock.recv(MAX_MESSAGE_SIZE)
+            except OSError:
+                # the socket was closed
+                return
+            message = decode(data)
+            if message is not None and self.accept(message):
+                if message.stamps is not None:
+                    message.stamps['received'] = time.time()
+                self.queue.append(message)
+                if self.notify is not None:
+                    self.notify()
+
+    def poll(self):
+        if not self.queue:
+            return []
+        messages = []
+        while self.queue:
+            messages.append(self.queue.popleft())
+        return messages
+
+    def close(self):
+        self.sock.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class FileReceiver(Receiver):
+    """
+    reads the lines appended to the command file since the last poll
+    """
+
+    # nothing tells the game about a new line, the file is checked at 60 Hz
+    poll_interval = 1 / 60
+
+    def __init__(self, path=COMMAND_FILE, notify=None):
+        super().__init__(notify)
+        self.path = path
+        # commands written before the game started are ignored
+        try:
+            self.offset = os.stat(path).st_size
+        except FileNotFoundError:
+            self.offset = 0
+
+    def poll(self):
+        try:
+            size = os.stat(self.path).st_size
+        except FileNotFoundError:
+            return []
+        if size == self.offset:
+            return []
+        if size < self.offset:
+            # the gesture program started again with a new file
+            self.offset = 0
+
+        with open(self.path, 'rb') as file:
+            file.seek(self.offset)
+            data = file.read(size - self.offset)
+        # only complete lines, the rest is read once the writer has finished it
+        data = data[:data.rfind(b'\n') + 1]
+        self.offset += len(data)
+
+        messages = []
+        received = time.time()
+        for line in data.splitlines():
+            message = decode(line)
+            if message is not None and self.accept(message):
+                if message.stamps is not None:
+                    message.stamps['received'] = received
+                messages.append(message)
+        return messages
+
+
+class Sender:
+    """
+    common part of the senders: numbers the messages
+    """
+
+    def __init__(self):
+        self.sender = '%d-%d' % (os.getpid(), time.time() * 1000)
+        self.seq = 0
+
+    def next_message(self, command, stamps=None):
+        self.seq += 1
+        sent = time.time()
+        if stamps is not None:
+            stamps['sent'] = sent
+        return Message(self.sender, self.seq, sent, command, stamps)
+
+    def send(self, command, stamps=None):
+        """
+        send one command, return whether it was delivered to the transport
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SocketSender(Sender):
+    def __init__(self, path=SOCKET_PATH):
+        super().__init__()
+        self.path = path
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+    def send(self, command, stamps=None):
+        try:
+            self.sock.sendto(encode(self.next_message(command, stamps)), self.path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            # the game is not running
+            return False
+        return True
+
+    def close(self):
+        self.sock.close()
+
+
+class FileSender(Sender):
+    def __init__(self, path=COMMAND_FILE):
+        super().__init__()
+        # start a new file, every command is appended as one line with a single write
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND, 0o644)
+
+    def send(self, command, stamps=None):
+        os.write(self.fd, encode(self.next_message(command, stamps)))
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+def open_receiver(kind=None, notify=None):
+    """
+    receiver of the configured transport (used by the game), notify is
+    called from the receiver thread when a message arrives
+    """
+    kind = kind or default_kind()
+    if kind == 'socket':
+        return SocketReceiver(notify=notify)
+    if kind == 'file':
+        return FileReceiver(notify=notify)
+    raise ValueError('unknown transport: %r' % (kind,))
+
+
+def open_sender(kind=None):
+    """
+    sender of the configured transport (used by the gesture program)
+    """
+    kind = kind or default_kind()
+    if kind == 'socket':
+        return SocketSender()
+    if kind == 'file':
+        return FileSender()
+    raise ValueError('unknown transport: %r' % (kind,))
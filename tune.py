@@ -0,0 +1,156 @@
+"""
+tune.py
+This program searches for better feature weights of the AI hint system. It
+plays many seeded headless games (engine.py) with the AI choosing every
+placement, spread over all CPU cores with a multiprocessing pool, and
+improves the weights with the cross-entropy method: every generation samples
+a population of weight vectors from a normal distribution, keeps the best
+fraction (the elite) and moves the distribution towards it. All candidates
+of one generation play the same seeds, so they are compared on equal games.
+Every generation plays new seeds, so the best scores of two generations are
+not comparable: at the end the final mean of the distribution and the best
+candidate of every generation play one more set of held-out games, and the
+winner of that comparison is written to ai_weights.json, which ai.py loads
+when the game starts. Features left out of --features keep their default
+weight in every candidate and in the file.
+
+Authors: Yifan Qin, Kevin Abeykoon, Joanna Joy, Vivian Ma
+
+Notes:
+>>> python3 tune.py (tune all features with the default settings)
+>>> python3 tune.py --features holes,height,bumpiness --generations 10 --games 4
+"""
+
+import argparse
+import json
+import multiprocessing
+import random
+import time
+
+from ai import DEFAULT_WEIGHTS, FEATURES, WEIGHTS_FILE, search_best_position
+from engine import Engine
+
+
+def full_weights(features, vector):
+    """
+    the default weights with the tuned features replaced by the values of the vector
+    """
+    weights = dict(DEFAULT_WEIGHTS)
+    weights.update(zip(features, vector))
+    return weights
+
+
+def play_game(weights, seed, max_pieces, depth):
+    """
+    lines cleared by the AI in one seeded game (stops after max_pieces blocks)
+    """
+    game = Engine(seed)
+    while not game.game_over and game.pieces <= max_pieces:
+        _, best = search_best_position([game.current_block, game.next_block], game.board, depth=depth,
+                                       weights=weights, cache=None)
+        if best is None:
+            break
+        turns, current_block, col, row = best
+        game.play(current_block, col, row)
+    return game.lines
+
+
+def play_task(task):
+    weights, seed, max_pieces, depth = task
+    return play_game(weights, seed, max_pieces, depth)
+
+
+def mean_lines(pool, candidates, seeds, max_pieces, depth):
+    """
+    mean lines of every candidate (a weights dict) over the same seeded games
+    """
+    tasks = [(weights, game_seed, max_pieces, depth) for weights in candidates for game_seed in seeds]
+    lines = pool.map(play_task, tasks, chunksize=1)
+    return [sum(lines[index * len(seeds):(index + 1) * len(seeds)]) / len(seeds) for index in range(len(candidates))]
+
+
+def cross_entropy(features, pool, generations, population, games, max_pieces, depth, elite_fraction, seed):
+    """
+    cross-entropy search over the weights of the features, returns the final
+    mean weights and the best candidate of every generation (each generation
+    plays other games, so their scores can not be compared with each other).
+    The features that are not tuned keep their default weights.
+    """
+    rng = random.Random(seed)
+    mean = [float(DEFAULT_WEIGHTS.get(name, 0)) for name in features]
+    std = [max(10.0, abs(value)) for value in mean]
+    elite_size = max(1, int(population * elite_fraction))
+    generation_bests = []
+
+    for generation in range(generations):
+        started = time.time()
+        candidates = [[rng.gauss(mu, sigma) for mu, sigma in zip(mean, std)] for _ in range(population)]
+        seeds = [rng.randrange(2 ** 32) for _ in range(games)]
+        fitness = mean_lines(pool, [full_weights(features, vector) for vector in candidates], seeds, max_pieces, depth)
+
+        ranked = sorted(range(population), key=lambda index: fitness[index], reverse=True)
+        elite = [candidates[index] for index in ranked[:elite_size]]
+        generation_bests.append(full_weights(features, candidates[ranked[0]]))
+
+        # move the distribution to the elite, with a little extra noise so it does not collapse too early
+        for i in range(len(features)):
+            values = [vector[i] for vector in elite]
+            mean[i] = sum(values) / elite_size
+            variance = sum((value - mean[i]) ** 2 for value in values) / elite_size
+            std[i] = variance ** 0.5 + 1.0 / (generation + 1)
+
+        print('generation %d: best %.1f lines, elite mean %.1f lines (%.1fs)'
+              % (generation + 1, fitness[ranked[0]], sum(fitness[index] for index in ranked[:elite_size]) / elite_size,
+                 time.time() - started))
+
+    return full_weights(features, mean), generation_bests
+
+
+def select_weights(pool, candidates, games, max_pieces, depth, seed):
+    """
+    the candidate with the most lines on one set of held-out games (not
+    played during the search), returns (weights, mean lines)
+    """
+    rng = random.Random(None if seed is None else 'held-out %d' % seed)
+    seeds = [rng.randrange(2 ** 32) for _ in range(games)]
+    fitness = mean_lines(pool, candidates, seeds, max_pieces, depth)
+    best = max(range(len(candidates)), key=lambda index: fitness[index])
+    return candidates[best], fitness[best]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='tune the feature weights of the AI hint system')
+    parser.add_argument('--features', default=','.join(FEATURES),
+                        help='comma separated features to tune (default: all of %s)' % ', '.join(FEATURES))
+    parser.add_argument('--generations', type=int, default=20)
+    parser.add_argument('--population', type=int, default=32)
+    parser.add_argument('--games', type=int, default=8, help='games played by every candidate')
+    parser.add_argument('--held-out', type=int, default=64,
+                        help='games on which the final mean and the best candidate of every generation are compared')
+    parser.add_argument('--pieces', type=int, default=500, help='blocks per game at most')
+    parser.add_argument('--depth', type=int, default=1, help='lookahead depth used while tuning')
+    parser.add_argument('--elite', type=float, default=0.25, help='fraction of the population kept')
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', default=WEIGHTS_FILE)
+    args = parser.parse_args()
+
+    features = [name.strip() for name in args.features.split(',') if name.strip()]
+    unknown = set(features) - set(FEATURES)
+    if unknown:
+        parser.error('unknown features: %s' % ', '.join(sorted(unknown)))
+
+    with multiprocessing.Pool(args.workers) as pool:
+        final_mean, generation_bests = cross_entropy(features, pool, args.generations, args.population, args.games,
+                                                     args.pieces, args.depth, args.elite, args.seed)
+        weights, fitness = select_weights(pool, [final_mean] + generation_bests, max(1, args.held_out), args.pieces,
+                                          args.depth, args.seed)
+
+    with open(args.output, 'w') as file:
+        json.dump({'weights': weights, 'lines': fitness, 'games': max(1, args.held_out), 'pieces': args.pieces}, file,
+                  indent=2)
+    print('best weights (%.1f lines per held-out game) written to %s' % (fitness, args.output))
+
+
+if __name__ == '__main__':
+    main()